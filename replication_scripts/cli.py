@@ -0,0 +1,183 @@
+"""
+Unified command line for the replication scripts.
+
+Every subcommand takes `<owner> <repo>` in that order. Heavy libraries (PyGithub, GitPython,
+pandas, scipy, requests, cliffs_delta) are only imported inside the subcommand that needs
+them, so `--help` and cache hits (outputs already on disk) return immediately.
+
+Usage:
+    python cli.py mine <owner> <repo> [--force] [--workers 8]  # collect_pulls.py
+    python cli.py link <owner> <repo> [--full]        # collect_releases.py, only new tags by default
+    python cli.py merge <owner> <repo> [--force]      # merge.py
+    python cli.py analyze <owner> <repo> [--out <csv>]
+    python cli.py analyze --suite                     # repos in metrics.mine_suite2
+    python cli.py analyze --original                  # authors' dataset
+    python cli.py compare                             # test.py
+    python cli.py bench [--runs 5]
+
+Example:
+    python cli.py mine Pylons pyramid
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+output_dir = os.path.join(script_dir, '..', 'outputs')
+mined_output_dir = os.path.join(output_dir, 'mined')
+dataset_dir = os.path.join(script_dir, '..', 'datasets')
+
+
+def mined_file(repo_name, suffix):
+    return os.path.join(mined_output_dir, f'{repo_name}_{suffix}.csv')
+
+
+def is_cached(output, inputs=()):
+    """True if `output` exists and is newer than all `inputs`"""
+    if not os.path.exists(output):
+        return False
+    mtime = os.path.getmtime(output)
+    return all(os.path.exists(i) and os.path.getmtime(i) <= mtime for i in inputs)
+
+
+def cmd_mine(args):
+    output = mined_file(args.repo, 'pulls_raw')
+    if not args.force and is_cached(output):
+        print(f"Using cached {output} (--force to re-mine)")
+        return
+    from collect_pulls import collect_pull_requests
+    collect_pull_requests(args.owner, args.repo, workers=args.workers)
+
+
+def cmd_link(args):
+    # No cache check here: the tag index is the cache, and an incremental run only links new tags
+    from collect_releases import collect_release_info
+    collect_release_info(args.owner, args.repo, full=args.full or args.force)
+
+
+def cmd_merge(args):
+    output = mined_file(args.repo, 'data_merged')
+    inputs = [mined_file(args.repo, 'pulls_raw'), mined_file(args.repo, 'releases_linked')]
+    if not args.force and is_cached(output, inputs):
+        print(f"Using cached {output} (--force to re-merge)")
+        return
+    from merge import consolidate_data
+    consolidate_data(args.owner, args.repo)
+
+
+def cmd_analyze(args):
+    from metrics import dataSetup, dataSetup_from_original_datasets, analysis, mine_suite2
+
+    if args.original:
+        pr_dataset = os.path.join(dataset_dir, 'pull_requests_meta_data.csv')
+        releases_dataset = os.path.join(dataset_dir, 'releases_meta_data.csv')
+        out_file = args.out if args.out is not None else os.path.join(output_dir, 'results_from_orignal_data.csv')
+        for repo, before_ci, after_ci in dataSetup_from_original_datasets(pr_dataset, releases_dataset):
+            analysis(before_ci, after_ci, repo, out_file)
+        return
+
+    if args.suite:
+        repos = mine_suite2
+    elif args.owner and args.repo:
+        repos = [(args.owner, args.repo)]
+    else:
+        print("Give <owner> <repo>, --suite or --original")
+        sys.exit(1)
+
+    out_file = args.out if args.out is not None else ''
+    for owner, repo in repos:
+        setup = dataSetup(repo, owner)
+        if setup is None:
+            continue
+        before_ci, after_ci = setup
+        analysis(before_ci, after_ci, repo, out_file)
+
+
+def cmd_compare(args):
+    from test import merge_projects_both_files, calculated_file, dataset_file, combined_file
+    merge_projects_both_files(args.calculated or calculated_file, dataset_file, combined_file)
+
+
+def time_command(argv, runs):
+    """Wall time (seconds) of `python cli.py <argv>` in a fresh interpreter, one per run"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__)] + argv,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def cmd_bench(args):
+    cases = [["--help"], ["mine", "--help"]]
+    # A cache-hit run on the first repo that already has mined PRs (owner isn't needed for a hit)
+    if os.path.isdir(mined_output_dir):
+        for name in sorted(os.listdir(mined_output_dir)):
+            if name.endswith('_pulls_raw.csv'):
+                cases.append(["mine", "-", name[:-len('_pulls_raw.csv')]])
+                break
+
+    slow = False
+    for argv in cases:
+        times = time_command(argv, args.runs)
+        median = statistics.median(times)
+        slow = slow or median > args.limit
+        print(f"{' '.join(argv):<35} median {median * 1000:7.1f} ms  min {min(times) * 1000:7.1f} ms")
+    if slow:
+        print(f"Startup slower than {args.limit:.1f}s, check for module-level heavy imports")
+        sys.exit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="PR delivery time replication pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in [
+        ("mine", cmd_mine, "collect PR data from the GitHub API"),
+        ("link", cmd_link, "collect releases and link PRs to them"),
+        ("merge", cmd_merge, "combine PR and release data into one CSV"),
+    ]:
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("owner")
+        p.add_argument("repo")
+        p.add_argument("--force", action="store_true",
+                       help="ignore existing outputs" if name != "link" else "same as --full")
+        p.set_defaults(func=func)
+    sub.choices["link"].add_argument("--full", action="store_true",
+                                     help="relink every release instead of only new tags")
+    sub.choices["mine"].add_argument("--workers", type=int, default=1,
+                                     help="threads fetching per-PR details (1 = sequential)")
+
+    p = sub.add_parser("analyze", help="MWW test and Cliff's delta (RQ1)")
+    p.add_argument("owner", nargs="?")
+    p.add_argument("repo", nargs="?")
+    p.add_argument("--suite", action="store_true", help="run on the repos in metrics.mine_suite2")
+    p.add_argument("--original", action="store_true", help="run on the authors' dataset")
+    p.add_argument("--out", help="results CSV to update (default: print the table)")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("compare", help="compare computed results with the authors' results")
+    p.add_argument("--calculated", help="results CSV to compare (default: results_from_orignal_data.csv)")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("bench", help="time CLI startup and cache-hit runs")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--limit", type=float, default=1.0, help="seconds allowed per run")
+    p.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,18 @@ Data Collection Script (Step 1)
 Collect the initial PR information using the GitHub API.
 
 Usage:
-    python collect_pulls.py <owner> <repo>
+    python collect_pulls.py <owner> <repo> [workers]
 
 Example:
     python collect_pulls.py Yelp mrjob
+    python collect_pulls.py Yelp mrjob 8     # fetch per-PR details on 8 threads
 """
 
 import sys
 import os
 import csv
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from github import Github
 from github import Auth
@@ -22,13 +25,73 @@ from github import Auth
 load_dotenv()
 
 
-def collect_pull_requests(owner: str, repo_name: str) -> None:
+FIELDS = [
+    "author","pull_number","title","description","churn","changed_files","activities",
+    "comments","comment_dates","state","creation_date","close_date","closed_by", "merged_at"
+]
+
+
+def build_pull_row(pr) -> dict:
+    """
+    Fetch the per-PR details (comments, review comments, issue events, closing user)
+    and return the CSV row. Safe to call from worker threads.
+    """
+    # Get comment dates
+    issue_comments = pr.get_issue_comments()
+    review_comments = pr.get_review_comments()
+    comment_dates = [
+        c.created_at.isoformat() for c in issue_comments] + [
+        c.created_at.isoformat() for c in review_comments]
+
+    # PRs can have `merged_by` but not `closed_by`, issues do have it
+    closed_by = None
+    if pr.merged:
+        closed_by = pr.merged_by
+    elif pr.state == 'closed':
+        issue = pr.as_issue()
+        closed_by = issue.closed_by
+
+    return {
+        "author": pr.user.login if pr.user else None,
+        "pull_number": pr.number,
+        "title": pr.title,
+        "description": len(pr.body) if pr.body else 0, # pr.body,
+        "churn": pr.additions + pr.deletions, # "number of added lines plus the number of deleted lines to a pull request"
+        "changed_files": pr.changed_files,
+        "activities": pr.get_issue_events().totalCount, # "an entry in the pull request' history"
+        "comments": pr.comments + pr.review_comments, # counts normal/review comments, but not the initial description 'comment'
+        "comment_dates": ";".join(comment_dates), # not clear how this is supposed to be handled
+        "state": "merged" if pr.merged else pr.state, # tried to account for merged here
+        "creation_date": pr.created_at.isoformat(), # ISO for consistency w/ comment dates
+        "close_date": pr.closed_at if pr.closed_at else None,
+        "closed_by": closed_by.login if closed_by else None,
+        "merged_at": pr.merged_at if pr.merged else None
+    }
+
+
+def iter_pulls_in_range(pull_requests, numbers):
+    """Yield PRs from the listing, limited to the (low, high) number range if given"""
+    for pr in pull_requests:
+        # print(pr.number) # just for tracking progress
+        if numbers is not None:
+            # Listing is newest first, so PR numbers only go down from here
+            if pr.number > numbers[1]:
+                continue
+            if pr.number < numbers[0]:
+                break
+        yield pr
+
+
+def collect_pull_requests(owner: str, repo_name: str, numbers=None, output_file=None, workers=1) -> None:
     """
     Mine repository data from GitHub.
 
     Args:
         owner: Repository owner (e.g., 'Yelp')
         repo: Repository name (e.g., 'mrjob')
+        numbers: Optional (low, high) PR number range to mine, inclusive (used for shards)
+        output_file: Optional CSV path instead of outputs/mined/<repo>_pulls_raw.csv
+        workers: Number of threads fetching per-PR details; 1 keeps the sequential loop
     """
     # Get GitHub token from environment
     token = os.getenv("GITHUB_TOKEN")
@@ -40,7 +103,7 @@ def collect_pull_requests(owner: str, repo_name: str) -> None:
 
     # Initialize GitHub API client here
     auth = Auth.Token(token)
-    git = Github(auth=auth)
+    git = Github(auth=auth, pool_size=workers if workers > 1 else None) # one pooled connection per thread
     repo = git.get_repo(f"{owner}/{repo_name}")
 
     print(f"\n{'=' * 60}")
@@ -51,52 +114,30 @@ def collect_pull_requests(owner: str, repo_name: str) -> None:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     mined_output_dir = os.path.join(script_dir, '..', 'outputs', 'mined') # moved this to /mined subfolder
     os.makedirs(mined_output_dir, exist_ok=True)
-    output_file = os.path.join(mined_output_dir, f'{repo_name}_pulls_raw.csv') # currently makes a CSV per repo, could combine into one
+    if output_file is None:
+        output_file = os.path.join(mined_output_dir, f'{repo_name}_pulls_raw.csv') # currently makes a CSV per repo, could combine into one
     
     # Collect PR information & metadata
     pull_requests = repo.get_pulls(state='all')
     with open(output_file, 'w', newline='', encoding='utf-8') as file:
-        fields = [
-            "author","pull_number","title","description","churn","changed_files","activities",
-            "comments","comment_dates","state","creation_date","close_date","closed_by", "merged_at"
-        ]
-        writer = csv.DictWriter(file, fieldnames=fields)
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
         writer.writeheader()
         
-        for pr in pull_requests:
-            # print(pr.number) # just for tracking progress
-            # Get comment dates
-            issue_comments = pr.get_issue_comments()
-            review_comments = pr.get_review_comments()
-            comment_dates = [
-                c.created_at.isoformat() for c in issue_comments] + [
-                c.created_at.isoformat() for c in review_comments]
-
-            # PRs can have `merged_by` but not `closed_by`, issues do have it
-            closed_by = None
-            if pr.merged:
-                closed_by = pr.merged_by
-            elif pr.state == 'closed':
-                issue = pr.as_issue()
-                closed_by = issue.closed_by
-
-            row = {
-                "author": pr.user.login if pr.user else None,
-                "pull_number": pr.number,
-                "title": pr.title,
-                "description": len(pr.body) if pr.body else 0, # pr.body,
-                "churn": pr.additions + pr.deletions, # "number of added lines plus the number of deleted lines to a pull request"
-                "changed_files": pr.changed_files,
-                "activities": pr.get_issue_events().totalCount, # "an entry in the pull request' history"
-                "comments": pr.comments + pr.review_comments, # counts normal/review comments, but not the initial description 'comment'
-                "comment_dates": ";".join(comment_dates), # not clear how this is supposed to be handled
-                "state": "merged" if pr.merged else pr.state, # tried to account for merged here
-                "creation_date": pr.created_at.isoformat(), # ISO for consistency w/ comment dates
-                "close_date": pr.closed_at if pr.closed_at else None,
-                "closed_by": closed_by.login if closed_by else None,
-                "merged_at": pr.merged_at if pr.merged else None
-            }
-            writer.writerow(row)
+        if workers <= 1:
+            for pr in iter_pulls_in_range(pull_requests, numbers):
+                writer.writerow(build_pull_row(pr))
+        else:
+            # The main thread keeps paging through the listing while the pool fetches
+            # details. Rows are written in listing order, and at most 2 * workers PRs are
+            # in flight so a slow PR holds back the listing instead of piling up memory.
+            pending = deque()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for pr in iter_pulls_in_range(pull_requests, numbers):
+                    pending.append(pool.submit(build_pull_row, pr))
+                    if len(pending) >= 2 * workers:
+                        writer.writerow(pending.popleft().result())
+                while pending:
+                    writer.writerow(pending.popleft().result())
         
     git.close()
 
@@ -105,15 +146,16 @@ def collect_pull_requests(owner: str, repo_name: str) -> None:
 
 def main():
     """Main entry point for the script"""
-    if len(sys.argv) != 3:
-        print("Usage: python collect_pulls.py <owner> <repo>")
-        print("Example: python collect_pulls.py Yelp mrjob")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python collect_pulls.py <owner> <repo> [workers]")
+        print("Example: python collect_pulls.py Yelp mrjob 8")
         sys.exit(1)
 
     owner = sys.argv[1]
     repo = sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else 1
 
-    collect_pull_requests(owner, repo)
+    collect_pull_requests(owner, repo, workers=workers)
 
 
 if __name__ == "__main__":
@@ -6,6 +6,8 @@ import os
 import sys
 import re
 import csv
+import json
+from datetime import datetime
 from git import Repo
 
 
@@ -17,13 +19,220 @@ def check_user_intended(tag_name):
     return True
 
 
-def collect_release_info(owner, repo_name):
+merge_pattern = re.compile(r"Merge pull request #(\d+)")
+revert_sha_pattern = re.compile(r"This reverts commit ([0-9a-f]{7,40})")
+revert_subject_pattern = re.compile(r'^((?:Revert ")+)Merge pull request #(\d+)')
+
+
+class RevertIndex:
+    """
+    Merge and revert commits seen while walking the tag ranges. Once the walk is done,
+    `flags()` tells which PRs were reverted, re-applied (revert of the revert) or merged
+    by more than one commit (duplicate).
+    """
+
+    VERSION = 2
+
+    def __init__(self):
+        self.merges = {}     # merge commit sha -> PR number
+        self.pr_merges = {}  # PR number -> merge commit shas
+        # revert commit sha -> (reverted sha or None, PR number or None, date, number of 'Revert "' prefixes)
+        self.reverts = {}
+
+    def add(self, commit):
+        """Index one commit, returns the PR number it merges (None if it isn't a PR merge)"""
+        message = commit.message
+        subject = message.split('\n', 1)[0]
+        if not subject.startswith('Revert "'):
+            # The body of a PR merge commit is the PR title, which for a PR made with
+            # GitHub's Revert button reads 'Revert "Merge pull request #N ..."': not a revert
+            match = merge_pattern.search(message)
+            if not match:
+                return None
+            pr_number = int(match.group(1))
+            self.merges[commit.hexsha] = pr_number
+            self.pr_merges.setdefault(pr_number, set()).add(commit.hexsha)
+            return pr_number
+
+        sha_match = revert_sha_pattern.search(message)
+        pr_match = revert_subject_pattern.match(subject)
+        if sha_match or pr_match:
+            self.reverts[commit.hexsha] = (
+                sha_match.group(1) if sha_match else None,
+                int(pr_match.group(2)) if pr_match else None,
+                commit.committed_date,
+                pr_match.group(1).count('Revert "') if pr_match else 1,
+            )
+        return None
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'version': self.VERSION, 'merges': self.merges, 'reverts': self.reverts}, file)
+
+    @classmethod
+    def load(cls, path):
+        """Raises ValueError for an index saved by an older version (relink to rebuild it)"""
+        index = cls()
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"{path} was written by an older version of the revert index")
+        for sha, pr_number in data['merges'].items():
+            index.merges[sha] = pr_number
+            index.pr_merges.setdefault(pr_number, set()).add(sha)
+        index.reverts = {sha: tuple(entry) for sha, entry in data['reverts'].items()}
+        return index
+
+    def _lookup(self, sha):
+        if sha in self.merges or sha in self.reverts:
+            return sha
+        for full in list(self.reverts) + list(self.merges): # abbreviated sha
+            if full.startswith(sha):
+                return full
+        return None
+
+    def _effect(self, revert_sha, seen=()):
+        """
+        ('revert' | 'reapply', PR number, nesting level) for a revert commit, or None if the
+        target is unknown. The level (1 for a revert, 2 for a revert of it, ...) orders
+        events committed in the same second.
+        """
+        target_sha, pr_number, _, depth = self.reverts[revert_sha]
+        target = self._lookup(target_sha) if target_sha else None
+        if target in self.reverts and target not in seen:
+            effect = self._effect(target, seen + (revert_sha,))
+            if effect:
+                return ('reapply' if effect[0] == 'revert' else 'revert', effect[1], effect[2] + 1)
+        if target in self.merges:
+            return ('revert', self.merges[target], 1)
+        if pr_number is not None:
+            # Target not in the walked history: 'Revert "Revert "Merge pull request #N' re-applies #N
+            return ('revert' if depth % 2 else 'reapply', pr_number, depth)
+        return None
+
+    def flags(self):
+        """PR number -> {'reverted', 'reapplied', 'duplicate'}; 'reverted' is the state after the latest event"""
+        events = {}
+        for revert_sha, (_, _, date, _) in self.reverts.items():
+            effect = self._effect(revert_sha)
+            if effect:
+                events.setdefault(effect[1], []).append((date, effect[2], effect[0]))
+
+        flags = {}
+        for pr_number in set(events) | set(self.pr_merges):
+            history = sorted(events.get(pr_number, []))
+            flags[pr_number] = {
+                'reverted': bool(history) and history[-1][2] == 'revert',
+                'reapplied': any(kind == 'reapply' for _, _, kind in history),
+                'duplicate': len(self.pr_merges.get(pr_number, ())) > 1,
+            }
+        return flags
+
+
+RELEASE_FIELDS = ['title', 'publish_date', 'start_date', 'number_of_commits', 'number_of_prs']
+LINKED_FIELDS = ['pull_number', 'release_tag', 'merge_sha', 'reverted', 'reapplied', 'duplicate']
+TAG_INDEX_FIELDS = ['name', 'sha', 'date', 'linked']
+NO_FLAGS = {'reverted': False, 'reapplied': False, 'duplicate': False}
+
+
+def read_tags(repo):
+    """
+    All tags with their target commit and its commit date, oldest first, from one
+    `git for-each-ref` call instead of dereferencing every tag through GitPython.
+    """
+    output = repo.git.for_each_ref(
+        'refs/tags',
+        format='%(refname:strip=2)%09%(objectname)%09%(*objectname)%09%(committerdate:iso-strict)%09%(*committerdate:iso-strict)')
+    tags = []
+    for line in output.splitlines():
+        name, sha, peeled_sha, date, peeled_date = line.split('\t')
+        if peeled_sha: # annotated tag, use the commit it points to
+            sha, date = peeled_sha, peeled_date
+        if not date: # points to a tree/blob, nothing to date the release by
+            continue
+        tags.append({'name': name, 'sha': sha, 'date': datetime.fromisoformat(date).isoformat()})
+    tags.sort(key=lambda t: datetime.fromisoformat(t['date'])) # consider sorting backwards to match other data
+    return tags
+
+
+def read_csv_rows(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def write_csv_rows(path, fields, rows, mode='w'):
+    with open(path, mode, newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        if mode == 'w':
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def linked_tag_count(tag_index, real_tags):
+    """
+    How many of the oldest release tags were already linked in a previous run, or 0 if the
+    index doesn't match the repo any more (tag moved or deleted, or a new tag sorts before
+    a linked one) and everything has to be relinked.
+    """
+    real_shas = {t['name']: t['sha'] for t in real_tags}
+    for name, entry in tag_index.items():
+        if entry['linked'] == 'True' and real_shas.get(name) != entry['sha']:
+            return 0
+    count = 0
+    while count < len(real_tags) and tag_index.get(real_tags[count]['name'], {}).get('linked') == 'True':
+        count += 1
+    if any(tag_index.get(t['name'], {}).get('linked') == 'True' for t in real_tags[count:]):
+        return 0
+    return count
+
+
+def link_release(repo, revert_index, releases_map, real_tags, i):
+    """Walk the commits of release `i` (since the previous release), mapping merged PRs to it"""
+    tag = real_tags[i]
+    if i == 0: # first release: everything up to the tag, handles missing `v1.0.0` in output
+        commit_range = tag['sha']
+        initial_commit = next(repo.iter_commits(reverse=True))
+        start_date = initial_commit.committed_datetime.isoformat()
+    else:
+        commit_range = f"{real_tags[i - 1]['sha']}..{tag['sha']}" # "receive only commits between two named revisions"
+        start_date = real_tags[i - 1]['date']
+
+    release_info = {'title': tag['name'], "publish_date": tag['date'], "start_date": start_date,
+                    "number_of_commits": 0, "number_of_prs": 0}
+    pr_numbers = set() # only count PRs once
+    for commit in repo.iter_commits(commit_range):
+        release_info["number_of_commits"] += 1
+        pr_number = revert_index.add(commit) # check if commit message has merge format
+        if pr_number is not None:
+            pr_numbers.add(pr_number) # add PR number to set
+            releases_map[pr_number] = (tag['name'], commit.hexsha) # map PR to release name
+    release_info["number_of_prs"] = len(pr_numbers)
+    return release_info
+
+
+def default_branch_head(repo):
+    """Fetched tip of the default branch (origin/HEAD), or the local HEAD without a remote one"""
+    try:
+        repo.git.rev_parse('--verify', '--quiet', 'refs/remotes/origin/HEAD')
+        return 'origin/HEAD'
+    except Exception:
+        return 'HEAD'
+
+
+def collect_release_info(owner, repo_name, output_dir=None, full=False):
+    """
+    Link merged PRs to releases. Runs incrementally: the tag index from the previous run
+    (<repo>_tag_index.csv) tells which releases are already linked, so only the ranges
+    ending at new tags are walked and their rows appended. `full` relinks everything.
+    """
     # File handling
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    mined_output_dir = os.path.join(script_dir, '..', 'outputs', 'mined')
+    mined_output_dir = output_dir or os.path.join(script_dir, '..', 'outputs', 'mined')
     os.makedirs(mined_output_dir, exist_ok=True)
     output_file = os.path.join(mined_output_dir, f'{repo_name}_releases_raw.csv')
     linked_file = os.path.join(mined_output_dir, f'{repo_name}_releases_linked.csv')
+    tag_index_file = os.path.join(mined_output_dir, f'{repo_name}_tag_index.csv')
+    commit_index_file = os.path.join(mined_output_dir, f'{repo_name}_commit_index.json')
     
     temp_repo_dir = os.path.join(script_dir, '..', '..', 'temp_repos') # in case of cloning automatically
     local_repo_path = os.path.join(temp_repo_dir, repo_name)
@@ -31,7 +240,7 @@ def collect_release_info(owner, repo_name):
 
 
 
-    # Clone repo if needed
+    # Clone repo if needed, otherwise fetch tags added since the last run
     if not os.path.isdir(local_repo_path):
         repo_url = f"https://github.com/{owner}/{repo_name}.git"
         print(f"Cloning repository from {repo_url} into {local_repo_path}...")
@@ -40,90 +249,134 @@ def collect_release_info(owner, repo_name):
         except Exception as e:
             print(f"Error cloning repository: {e}")
             sys.exit(1)
+        repo = Repo(local_repo_path)
+    else:
+        repo = Repo(local_repo_path)
+        try:
+            # Updates origin/* and the tags; the local branch (HEAD) is left where it was
+            repo.git.fetch('--tags', 'origin')
+        except Exception as e:
+            print(f"Could not fetch tags, using local ones: {e}")
+    head = default_branch_head(repo)
 
 
 
     # Collect info w/ GitPython
-    repo = Repo(local_repo_path)
-    all_tags = sorted(repo.tags, key=lambda t: t.commit.committed_datetime) # consider sorting backwards to match other data
-    real_tags = [tag for tag in all_tags if check_user_intended(tag.name)]
-    merge_pattern = re.compile(r"Merge pull request #(\d+)")
+    all_tags = read_tags(repo)
+    real_tags = [tag for tag in all_tags if check_user_intended(tag['name'])]
+
+    outputs_exist = all(os.path.exists(f) for f in (output_file, linked_file, tag_index_file, commit_index_file))
+    tag_index = {row['name']: row for row in read_csv_rows(tag_index_file)} if outputs_exist and not full else {}
+    start = linked_tag_count(tag_index, real_tags) if tag_index else 0
+    if start:
+        try:
+            revert_index = RevertIndex.load(commit_index_file)
+        except ValueError as e:
+            print(f"{e}, relinking all releases")
+            start = 0
+
+    if start:
+        existing_links = {int(row['pull_number']): row for row in read_csv_rows(linked_file)}
+        print(f"{start} releases already linked, linking {len(real_tags) - start} new ones")
+    else:
+        revert_index = RevertIndex()
+        existing_links = {}
+
     releases_data = []
     releases_map = {}
+    for i in range(start, len(real_tags)):
+        releases_data.append(link_release(repo, revert_index, releases_map, real_tags, i))
 
-    if real_tags: # copy of below loop, handles missing `v1.0.0` in output
-        first_tag = real_tags[0]
-        first_info = {'title': first_tag.name,"publish_date": first_tag.commit.committed_datetime.isoformat(),
-            "start_date": None,"number_of_commits": 0, "number_of_prs": 0}
-        pr_numbers = set()
-        for commit in repo.iter_commits(first_tag.name):
-            first_info["number_of_commits"] += 1
-            match = merge_pattern.search(commit.message)
-            if match:
-                pr_number = int(match.group(1))
-                pr_numbers.add(pr_number)
-                releases_map[pr_number] = first_tag.name
-        first_info["number_of_prs"] = len(pr_numbers)
-        initial_commit = next(repo.iter_commits(reverse=True))
-        first_info["start_date"] = initial_commit.committed_datetime.isoformat()
-        releases_data.append(first_info)
-
-    for i in range(len(real_tags) - 1):
-        start_tag = real_tags[i]
-        end_tag = real_tags[i+1]
-        release_info = {'title': end_tag.name, # temp
-            "publish_date": end_tag.commit.committed_datetime.isoformat(),
-            "start_date": start_tag.commit.committed_datetime.isoformat(),
-            "number_of_commits": 0, "number_of_prs": 0
-        }
-
-        # Get commits from between the tags
-        commit_range = f'{start_tag.name}..{end_tag.name}' # "receive only commits between two named revisions"
-        pr_numbers = set() # only count PRs once
-        for commit in repo.iter_commits(commit_range):
-            release_info["number_of_commits"] += 1
-            match = merge_pattern.search(commit.message) # check if commit message has merge format
-            if match:
-                pr_number = int(match.group(1))
-                pr_numbers.add(pr_number) # add PR number to set
-                releases_map[pr_number] = end_tag.name # map PR to release name
-        
-        release_info["number_of_prs"] = len(pr_numbers)
-        releases_data.append(release_info)
-
-    if not releases_data or not releases_map:
+    # Reverts made after the last release still matter for the PRs it shipped
+    if real_tags:
+        for commit in repo.iter_commits(f"{real_tags[-1]['sha']}..{head}"):
+            revert_index.add(commit)
+    pr_flags = revert_index.flags()
+
+    if not start and (not releases_data or not releases_map):
         print("No release data and/or PR mapping, double-check repo and code")
         return
 
+    # PR-to-release rows: earlier links first, updated by the new ranges and the new flags
+    linked_rows = {}
+    for pr_num, row in existing_links.items():
+        release_tag, merge_sha = releases_map.pop(pr_num, (row['release_tag'], row['merge_sha']))
+        linked_rows[pr_num] = {'pull_number': pr_num, 'release_tag': release_tag, 'merge_sha': merge_sha,
+                               **pr_flags.get(pr_num, NO_FLAGS)}
+    existing_changed = any({k: str(v) for k, v in linked_rows[pr].items()} != row
+                           for pr, row in existing_links.items())
+    new_rows = [{'pull_number': pr_num, 'release_tag': release_tag, 'merge_sha': merge_sha,
+                 **pr_flags.get(pr_num, NO_FLAGS)}
+                for pr_num, (release_tag, merge_sha) in releases_map.items()]
 
 
-    # Save release information to CSV
-    with open(output_file, 'w', newline='', encoding='utf-8') as file:
-        fields = ['title', 'publish_date', 'start_date', 'number_of_commits', 'number_of_prs']
-        writer = csv.DictWriter(file, fieldnames=fields)
-        writer.writeheader()
-        writer.writerows(releases_data)
 
-    # Save PR-to-release mapping to separate CSV
-    with open(linked_file, 'w', newline='', encoding='utf-8') as file:
-        fields = ['pull_number', 'release_tag']
-        writer = csv.DictWriter(file, fieldnames=fields)
-        writer.writeheader()
-        for pr_num, release_tag in releases_map.items():
-            writer.writerow({'pull_number': pr_num, 'release_tag': release_tag})
+    # Save release information to CSV (append the new releases when running incrementally)
+    if not start:
+        write_csv_rows(output_file, RELEASE_FIELDS, releases_data)
+    elif releases_data:
+        write_csv_rows(output_file, RELEASE_FIELDS, releases_data, mode='a')
+
+    # Save PR-to-release mapping to separate CSV, rewritten only if earlier rows changed
+    if not start or existing_changed:
+        write_csv_rows(linked_file, LINKED_FIELDS, list(linked_rows.values()) + new_rows)
+    elif new_rows:
+        write_csv_rows(linked_file, LINKED_FIELDS, new_rows, mode='a')
 
-    print(f"Saved release info for repo '{repo_name}'")
+    real_names = {tag['name'] for tag in real_tags}
+    write_csv_rows(tag_index_file, TAG_INDEX_FIELDS,
+                   [{**tag, 'linked': tag['name'] in real_names} for tag in all_tags])
+    revert_index.save(commit_index_file)
+
+    print(f"Saved release info for repo '{repo_name}' ({len(releases_data)} new releases)")
+
+
+def check_revert_flags():
+    """
+    Flags for GitHub's Revert button flow (as in Yelp/mrjob #448): PR #10 is merged,
+    PR #12 reverts it and PR #13 reverts #12. #10 shipped in the end, so it must be
+    reapplied and not reverted, with and without the 'This reverts commit' lines.
+    """
+    from types import SimpleNamespace
+
+    def history(with_shas):
+        def commit(sha, message):
+            # All in the same second, like a scripted history: order must come from the revert chain
+            return SimpleNamespace(hexsha=sha * 40, message=message, committed_date=0)
+        reverts = lambda sha: f"\n\nThis reverts commit {sha * 40}." if with_shas else ""
+        return [
+            commit('a', 'Merge pull request #10 from x/a\n\nAdd a'),
+            commit('b', f'Revert "Merge pull request #10 from x/a"{reverts("a")}'),
+            commit('c', 'Merge pull request #12 from x/revert-10-a\n\nRevert "Merge pull request #10 from x/a"'),
+            commit('d', f'Revert "Revert "Merge pull request #10 from x/a""{reverts("b")}'),
+            commit('e', 'Merge pull request #13 from x/revert-12-revert-10-a\n\n'
+                        'Revert "Revert "Merge pull request #10 from x/a""'),
+        ]
+
+    for with_shas in (True, False):
+        index = RevertIndex()
+        for commit in history(with_shas):
+            index.add(commit)
+        flags = index.flags()
+        expected = {10: {'reverted': False, 'reapplied': True, 'duplicate': False},
+                    12: NO_FLAGS, 13: NO_FLAGS}
+        assert flags == expected, f"with_shas={with_shas}: {flags}"
+    print("Revert flags OK")
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python collect_releases.py <owner> <repo>")
+    if sys.argv[1:] == ['--check']:
+        check_revert_flags()
+        return
+    if len(sys.argv) not in (3, 4) or (len(sys.argv) == 4 and sys.argv[3] != '--full'):
+        print("Usage: python collect_releases.py <owner> <repo> [--full]")
+        print("       python collect_releases.py --check  # revert/re-apply flags on a known history")
         print("Example: python collect_releases.py Yelp mrjob")
         sys.exit(1)
     
     owner = sys.argv[1]
     repo = sys.argv[2]
-    collect_release_info(owner, repo)
+    collect_release_info(owner, repo, full=len(sys.argv) == 4)
 
 
 if __name__ == '__main__':
@@ -23,24 +23,26 @@ def consolidate_data(owner, repo_name):
         print("Couldn't find CSV input files, check args or try running data collection scripts")
         sys.exit(1)
 
-    # Read from 'linking' file
+    # Read from 'linking' file (release_tag plus the linker's revert/duplicate flags, if present)
     releases_map = {}
     with open(linking_file, 'r', encoding='utf-8') as file:
         reader = csv.DictReader(file)
+        link_fields = [f for f in reader.fieldnames if f != 'pull_number']
         for row in reader:
-            releases_map[row['pull_number']] = row['release_tag']
+            releases_map[row['pull_number']] = row
     
     # Read from raw PR file
     with open(pulls_file,'r',encoding='utf-8') as pr,open(merged_file,'w',newline='',encoding='utf-8') as out:
         reader = csv.DictReader(pr)
-        fields = reader.fieldnames + ['release_tag']
+        fields = reader.fieldnames + link_fields
         writer = csv.DictWriter(out, fieldnames=fields)
         writer.writeheader()
 
         for row in reader:
             pr_number = row['pull_number']
-            release_tag = releases_map.get(pr_number)
-            row['release_tag'] = release_tag
+            link = releases_map.get(pr_number, {})
+            for field in link_fields:
+                row[field] = link.get(field)
             writer.writerow(row)
 
 
@@ -20,7 +20,7 @@ dataset_dir = os.path.join(script_dir, '..', 'datasets')
 mined_output_dir = os.path.join(script_dir, '..', 'outputs', 'mined')
 
 
-def dataSetup_from_original_datasets(pull_csv_path: str, release_csv_path: str):
+def dataSetup_from_original_datasets(pull_csv_path: str, release_csv_path: str, sketches=None):
     """
     Load the original authors' datasets and return a list of:
     
@@ -31,6 +31,7 @@ def dataSetup_from_original_datasets(pull_csv_path: str, release_csv_path: str):
         - t2 (delivery_time)
         - lifetime
     Compatible with analysis().
+    If a SketchStore (sketches.py) is given, each project's groups are streamed into it.
     """
 
     import pandas as pd
@@ -73,6 +74,10 @@ def dataSetup_from_original_datasets(pull_csv_path: str, release_csv_path: str):
             print(f"Skipping {project_name}: insufficient before/after data.")
             continue
 
+        if sketches is not None:
+            sketches.update(project_name, "NO-CI", before_ci)
+            sketches.update(project_name, "CI", after_ci)
+
         results.append((project_name, before_ci, after_ci))
 
     return results
@@ -106,6 +111,21 @@ def transform_to_metric_table(df: pd.DataFrame) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
+#Labeling as per the paper
+def cliff_magnitude(delta):
+    if delta is None:
+        return ""
+    abs_delta = abs(delta)
+    if abs_delta < 0.147:
+        return "negligible"
+    elif abs_delta < 0.33:
+        return "small"
+    elif abs_delta < 0.474:
+        return "medium"
+    else:
+        return "large"
+
+
 def analysis(before_ci: pd.DataFrame, after_ci: pd.DataFrame, repo, out_file: str):
     """
     Compute MWW and Cliff's delta for delivery delay (t2), merge time (t1), and PR lifetime.
@@ -122,20 +142,6 @@ def analysis(before_ci: pd.DataFrame, after_ci: pd.DataFrame, repo, out_file: st
         "merge time": "t1",
         "PR lifetime": "lifetime"
     }
-    #Labeling as per the paper
-    def cliff_magnitude(delta):
-        if delta is None:
-            return ""
-        abs_delta = abs(delta)
-        if abs_delta < 0.147:
-            return "negligible"
-        elif abs_delta < 0.33:
-            return "small"
-        elif abs_delta < 0.474:
-            return "medium"
-        else:
-            return "large"
-
     # Decimal formatting function for output
     def fmt(x):
         if x is None:
@@ -264,13 +270,14 @@ def first_CI_by_TRAVIS_API(owner, repo_name):
 
 
 
-def dataSetup(repo_name, owner):
-    
-    # Reading release and pull request data
-    ci_start_date = first_CI_by_TRAVIS_API(owner, repo_name)
-    if ci_start_date == None:
-        print("CI start date not found, Run first_CI_by_TRAVIS_API on the repo/s to check")
-        sys.exit(1)
+def load_mined_data(repo_name, exclude_flags=('reverted',)):
+    """
+    Load the mined release + PR CSVs for a repo and return one DataFrame with
+    creation/merge/publish dates and the t1, t2 and lifetime columns.
+    PRs flagged by the release linker with any of `exclude_flags` (reverted, reapplied,
+    duplicate) are dropped, like the authors' dataset which leaves out reverted PRs.
+    Returns None if the mined files are missing.
+    """
     try:
         print(os.path.join(mined_output_dir, f"{repo_name}_releases_raw.csv"))
         release_data_raw = pd.read_csv(os.path.join(mined_output_dir, f"{repo_name}_releases_raw.csv"))
@@ -278,7 +285,14 @@ def dataSetup(repo_name, owner):
         release_data_link = pd.read_csv(os.path.join(mined_output_dir, f"{repo_name}_releases_linked.csv"))
     except:
         print("If file does not exit, run collect_pull.py and collect_release.py for this repo then try again")
-        return
+        return None
+
+    # Column mask on the linker's flags (older linked files don't have them)
+    for flag in exclude_flags:
+        if flag in release_data_link.columns:
+            flagged = release_data_link[flag].astype(str).str.lower() == 'true'
+            release_data_link = release_data_link[~flagged]
+
     # Rename title -> release_tag
     release_data = release_data_raw.rename(columns={'title': 'release_tag'})
 
@@ -315,12 +329,31 @@ def dataSetup(repo_name, owner):
     data["t2"] = (data['publish_date'] - data['merged_at']).dt.total_seconds()
     data["lifetime"] = data['t1'] + data['t2']
 
+    return data
+
+
+def dataSetup(repo_name, owner, sketches=None, exclude_flags=('reverted',)):
+    
+    # Reading release and pull request data
+    ci_start_date = first_CI_by_TRAVIS_API(owner, repo_name)
+    if ci_start_date == None:
+        print("CI start date not found, Run first_CI_by_TRAVIS_API on the repo/s to check")
+        sys.exit(1)
+    data = load_mined_data(repo_name, exclude_flags)
+    if data is None:
+        return
+
 
 
     # Create two DataFrames: before and after CI start date
     before_ci = data[data['creation_date'] < ci_start_date]
     after_ci = data[data['creation_date'] >= ci_start_date]
 
+    # Optionally stream the split into quantile sketches (see sketches.py)
+    if sketches is not None:
+        sketches.update(f"{owner}/{repo_name}", "NO-CI", before_ci)
+        sketches.update(f"{owner}/{repo_name}", "CI", after_ci)
+
     # Printing the data
     #print("Before CI")
     #print(before_ci[['pull_number', 't1', 't2', 'lifetime']])
@@ -330,6 +363,42 @@ def dataSetup(repo_name, owner):
 
     return before_ci, after_ci
 
+
+#Travis CI API Authentication was availble for following repos in mine_suite1
+mine_suite1 = [
+    ('yiisoft' ,'yii'),
+    ('vanilla' ,'vanilla'),
+    ('scikit-image' ,'scikit-image'),
+    ('dropwizard' ,'dropwizard'),
+    ('androidannotations' ,'androidannotations'),
+    ('jashkenas' ,'backbone'),
+    ('bcit-ci' ,'CodeIgniter'),
+    ('mizzy' ,'serverspec'),
+    ('ReactiveX' ,'RxJava'),
+    ('Netflix' ,'Hystrix'),
+    ('refinery' ,'refinerycms'),
+    ('Pylons' ,'pyramid'),
+    ('ether' ,'etherpad-lite'),
+    ('jashkenas' ,'underscore'),
+    ('BabylonJS' ,'Babylon.js'),
+    ('loomio' ,'loomio'),
+    ('scikit-learn' ,'scikit-learn'),
+    ('puppetlabs' ,'puppet'),
+    ('woocommerce' ,'woocommerce'),
+    ('scipy' ,'scipy'),
+    ('matplotlib' ,'matplotlib'),
+    ('ipython' ,'ipython')
+]
+#repos we minned
+mine_suite2 = [
+    ('Netflix', 'Hystrix'),        # Java
+    ('mizzy', 'serverspec'),       # Ruby
+    ('yiisoft' ,'yii'),            # PHP
+    ('jashkenas' ,'backbone'),     # JavaScript
+    ('Pylons' ,'pyramid'),         # Python
+]
+
+
 def main():
     #Main entry point for the script
     #1
@@ -343,39 +412,6 @@ def main():
     owner = sys.argv[2]
     before_ci, after_ci =  dataSetup(repo, owner)
     analysis(before_ci, after_ci, repo,"")
-    #Travis CI API Authentication was availble for following repos in mine_suite1
-    mine_suite1 = [
-                ('yiisoft' ,'yii'),
-                ('vanilla' ,'vanilla'),
-                ('scikit-image' ,'scikit-image'),
-                ('dropwizard' ,'dropwizard'),
-                ('androidannotations' ,'androidannotations'),
-                ('jashkenas' ,'backbone'),
-                ('bcit-ci' ,'CodeIgniter'),
-                ('mizzy' ,'serverspec'),
-                ('ReactiveX' ,'RxJava'),
-                ('Netflix' ,'Hystrix'),
-                ('refinery' ,'refinerycms'),
-                ('Pylons' ,'pyramid'),
-                ('ether' ,'etherpad-lite'),
-                ('jashkenas' ,'underscore'),
-                ('BabylonJS' ,'Babylon.js'),
-                ('loomio' ,'loomio'),
-                ('scikit-learn' ,'scikit-learn'),
-                ('puppetlabs' ,'puppet'),
-                ('woocommerce' ,'woocommerce'),
-                ('scipy' ,'scipy'),
-                ('matplotlib' ,'matplotlib'),
-                ('ipython' ,'ipython')
-        ]
-    #repos we minned\
-    mine_suite2 = [
-        ('Netflix', 'Hystrix'),        # Java
-        ('mizzy', 'serverspec'),       # Ruby
-        ('yiisoft' ,'yii'),            # PHP
-        ('jashkenas' ,'backbone'),     # JavaScript
-        ('Pylons' ,'pyramid'),         # Python
-    ]
     for owner, repo in mine_suite2:
         before_ci, after_ci =  dataSetup(repo, owner)
         analysis(before_ci, after_ci, repo,"")
@@ -0,0 +1,167 @@
+"""
+Incremental rank statistics
+
+Keeps the Mann-Whitney U / Cliff's delta state for two samples that change one
+value at a time, so a moving split point (CI cutoff sweep, sliding windows) does
+not need to re-run `mannwhitneyu` and `cliffs_delta` from scratch.
+"""
+
+import math
+from bisect import bisect_left
+
+
+# Below this many values in either sample, p_value() defers to `mannwhitneyu`, whose
+# default switches to the exact distribution there; the normal approximation drifts off
+SMALL_SAMPLE = 8
+
+
+class FenwickTree:
+    """Counts per value rank, with prefix sums and k-th smallest lookup."""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.total = 0
+        self.top_bit = 1 << max(size.bit_length() - 1, 0) if size else 0
+
+    def add(self, rank, delta):
+        self.total += delta
+        i = rank + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, rank):
+        """Number of stored values with rank < `rank`"""
+        count = 0
+        i = rank
+        while i > 0:
+            count += self.tree[i]
+            i -= i & -i
+        return count
+
+    def count(self, rank):
+        return self.prefix(rank + 1) - self.prefix(rank)
+
+    def kth(self, k):
+        """Rank of the k-th smallest stored value (0-based k)"""
+        pos = 0
+        remaining = k + 1
+        bit = self.top_bit
+        while bit:
+            nxt = pos + bit
+            if nxt <= self.size and self.tree[nxt] < remaining:
+                pos = nxt
+                remaining -= self.tree[nxt]
+            bit >>= 1
+        return pos
+
+
+class TwoSampleRanks:
+    """
+    Rank-sum state for a `first` and `second` sample drawn from a fixed set of values.
+
+    `greater` holds the number of (first, second) pairs where the second value is larger,
+    counting ties as 0.5, which is all that U, Cliff's delta and the MWW p-value need.
+    """
+
+    def __init__(self, universe):
+        self.values = sorted(set(universe))
+        self.first = FenwickTree(len(self.values))
+        self.second = FenwickTree(len(self.values))
+        self.greater = 0.0
+        self.tie_counts = [0] * len(self.values)
+        self.tie_term = 0  # sum of t^3 - t over tied groups in the pooled sample
+
+    def _rank(self, value):
+        return bisect_left(self.values, value)
+
+    def _pool(self, rank, delta):
+        t = self.tie_counts[rank]
+        if delta > 0:
+            self.tie_term += 3 * t * t + 3 * t
+        else:
+            self.tie_term -= 3 * t * t - 3 * t
+        self.tie_counts[rank] = t + delta
+
+    def add_first(self, value):
+        r = self._rank(value)
+        self.greater += (self.second.total - self.second.prefix(r + 1)) + 0.5 * self.second.count(r)
+        self.first.add(r, 1)
+        self._pool(r, 1)
+
+    def remove_first(self, value):
+        r = self._rank(value)
+        self.first.add(r, -1)
+        self.greater -= (self.second.total - self.second.prefix(r + 1)) + 0.5 * self.second.count(r)
+        self._pool(r, -1)
+
+    def add_second(self, value):
+        r = self._rank(value)
+        self.greater += self.first.prefix(r) + 0.5 * self.first.count(r)
+        self.second.add(r, 1)
+        self._pool(r, 1)
+
+    def remove_second(self, value):
+        r = self._rank(value)
+        self.second.add(r, -1)
+        self.greater -= self.first.prefix(r) + 0.5 * self.first.count(r)
+        self._pool(r, -1)
+
+    @property
+    def n_first(self):
+        return self.first.total
+
+    @property
+    def n_second(self):
+        return self.second.total
+
+    def u_first(self):
+        """U statistic of the first sample, as returned by `mannwhitneyu(first, second)`"""
+        return self.n_first * self.n_second - self.greater
+
+    def cliffs_delta(self):
+        """Same sign convention as `cliffs_delta(second, first)`"""
+        pairs = self.n_first * self.n_second
+        if pairs == 0:
+            return None
+        return (2 * self.greater - pairs) / pairs
+
+    def _sample(self, tree):
+        return [value for rank, value in enumerate(self.values) for _ in range(tree.count(rank))]
+
+    def p_value(self):
+        """
+        Two-sided MWW p-value, the same as `mannwhitneyu(first, second)` in metrics.analysis:
+        the normal approximation with tie and continuity correction (scipy's 'asymptotic'
+        method), or scipy itself when a sample has at most SMALL_SAMPLE values.
+        """
+        n1, n2 = self.n_first, self.n_second
+        if n1 == 0 or n2 == 0:
+            return None
+        if min(n1, n2) <= SMALL_SAMPLE:
+            from scipy.stats import mannwhitneyu
+            p = mannwhitneyu(self._sample(self.first), self._sample(self.second), alternative='two-sided').pvalue
+            return None if math.isnan(p) else float(p)
+        n = n1 + n2
+        u = max(self.u_first(), self.greater)
+        mu = n1 * n2 / 2
+        variance = n1 * n2 / 12 * ((n + 1) - self.tie_term / (n * (n - 1)))
+        if variance <= 0:
+            return None
+        z = (u - mu - 0.5) / math.sqrt(variance)
+        return min(max(math.erfc(z / math.sqrt(2)), 0.0), 1.0)
+
+    def _median(self, tree):
+        n = tree.total
+        if n == 0:
+            return None
+        lo = self.values[tree.kth((n - 1) // 2)]
+        hi = self.values[tree.kth(n // 2)]
+        return (lo + hi) / 2
+
+    def median_first(self):
+        return self._median(self.first)
+
+    def median_second(self):
+        return self._median(self.second)
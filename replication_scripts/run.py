@@ -2,12 +2,6 @@ import argparse
 import sys
 import os
 
-# Import your modules
-from collect_pulls import collect_pull_requests
-from collect_releases import collect_release_info
-from merge import consolidate_data
-from metrics import dataSetup, analysis
-
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 output_dir = os.path.join(script_dir, '..', 'outputs')
@@ -17,6 +11,12 @@ def run_pipeline(owner: str, repo: str):
     """
     Runs the full replication pipeline for a single repository.
     """
+    # Imported here so `run.py` starts fast; each step pulls in PyGithub/GitPython/pandas
+    from collect_pulls import collect_pull_requests
+    from collect_releases import collect_release_info
+    from merge import consolidate_data
+    from metrics import dataSetup, analysis
+
     print(f"\n===== Running pipeline for {owner}/{repo} =====")
 
     try:
@@ -41,19 +41,32 @@ def run_pipeline(owner: str, repo: str):
 
 
 def main():
-    if len(sys.argv) > 3:
-        print("Usage: python run.py <repo> <owner>")
-        print("Example: python run.py mrjob Yelp")
-        print("If you don't give any repo, it will run for 5 repos we minned")
-        sys.exit(1)
-    elif len(sys.argv) == 3:
-        repo = sys.argv[1]
-        owner = sys.argv[2]
-    
-    # Case 1: Single repo via CLI
-        run_pipeline(owner, repo)
-
-    # Case 2: Batch mode
+    parser = argparse.ArgumentParser(
+        description="Run the replication pipeline. Without <repo> <owner> it runs for the 5 repos we minned.",
+        epilog="Example: python run.py mrjob Yelp")
+    parser.add_argument("repo", nargs="?")
+    parser.add_argument("owner", nargs="?")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--coordinator", action="store_true", help="queue mining tasks for the repo(s) instead of running them")
+    mode.add_argument("--worker", action="store_true", help="claim and run queued tasks until the queue is drained")
+    mode.add_argument("--reduce", action="store_true", help="merge finished shards into outputs/mined and analyze them")
+    parser.add_argument("--suite", help="CSV with owner,repo columns (e.g. outputs/screening/suite.csv from screen.py)")
+    parser.add_argument("--queue", help="queue file or URL (default: outputs/queue/queue.db)")
+    parser.add_argument("--shard-size", type=int, help="coordinator: split each repo's PRs into ranges of this many numbers")
+    parser.add_argument("--processes", type=int, default=1, help="worker: number of local worker processes")
+    parser.add_argument("--lease", type=int, default=300, help="worker: lease length in seconds")
+    parser.add_argument("--wait", action="store_true", help="worker: keep polling after the queue is drained")
+    args = parser.parse_args()
+
+    if (args.repo is None) != (args.owner is None):
+        parser.error("give both <repo> and <owner>, or neither")
+
+    if args.repo:
+        repos = [(args.owner, args.repo)]
+    elif args.suite:
+        import csv
+        with open(args.suite, 'r', encoding='utf-8') as file:
+            repos = [(row['owner'], row['repo']) for row in csv.DictReader(file)]
     else:
         repos = [
             ('Netflix', 'Hystrix'),        # Java
@@ -63,8 +76,21 @@ def main():
             ('Pylons' ,'pyramid'),         # Python
         ]
 
-        for owner, repo in repos:
-            run_pipeline(owner, repo)
+    if args.coordinator or args.worker or args.reduce:
+        import shards
+        from workqueue import open_queue
+        queue_url = args.queue or shards.default_queue
+        if args.coordinator:
+            shards.enqueue_repos(open_queue(queue_url), repos, args.shard_size)
+        elif args.worker:
+            shards.start_workers(args.processes, queue_url, args.lease, args.wait)
+        else:
+            shards.reduce(queue_url)
+        return
+
+    # Case 1: Single repo via CLI / Case 2: Batch mode
+    for owner, repo in repos:
+        run_pipeline(owner, repo)
 
 
 if __name__ == "__main__":
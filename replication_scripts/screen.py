@@ -0,0 +1,316 @@
+"""
+Candidate Repository Screening
+
+Ranks and filters a large list of candidate repos before any mining is launched. For each
+repo it fetches PR/merged PR/tag counts and whether a CI config was ever committed to the
+default branch (it may have been deleted since), using batched GraphQL queries (one
+request per `batch` repos). From the counts it estimates the REST calls `collect_pulls.py`
+will make and the time they take, and writes a ready-to-run suite (usable with
+`python run.py --suite`) along with the projected total.
+
+Results are cached in outputs/screening/cache.json, so re-screening a list only queries
+repos that are new or older than `--max-age` days.
+
+Usage:
+    python screen.py <candidates file> [--min-prs 100] [--max-prs 5000] [--min-tags 5]
+                     [--require-ci travis|actions|any|none] [--exclude-archived]
+                     [--budget-hours 48] [--workers 1]
+
+The candidates file has one `owner/repo` per line, or is a CSV whose first two columns
+are owner and repo (e.g. a previous suite.csv).
+
+Example:
+    python screen.py candidates.txt --budget-hours 24
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import math
+import time
+import argparse
+from datetime import datetime, timezone
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+screening_output_dir = os.path.join(script_dir, '..', 'outputs', 'screening')
+cache_file = os.path.join(screening_output_dir, 'cache.json')
+suite_file = os.path.join(screening_output_dir, 'suite.csv')
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+# CI configs are looked up in the default branch's history, not only at HEAD: many repos
+# that adopted Travis have since deleted .travis.yml (or been archived)
+REPO_FIELDS = """
+    nameWithOwner
+    isArchived
+    primaryLanguage { name }
+    pullRequests { totalCount }
+    merged: pullRequests(states: MERGED) { totalCount }
+    refs(refPrefix: "refs/tags/") { totalCount }
+    travisAtHead: object(expression: "HEAD:.travis.yml") { __typename }
+    actionsAtHead: object(expression: "HEAD:.github/workflows") { __typename }
+    defaultBranchRef {
+        target {
+            ... on Commit {
+                travis: history(first: 1, path: ".travis.yml") { totalCount nodes { committedDate } }
+                actions: history(first: 1, path: ".github/workflows") { totalCount }
+            }
+        }
+    }
+"""
+# Bumped when the cached info changes shape, so older entries are re-queried
+CACHE_VERSION = 2
+
+# REST cost model of collect_pulls.py
+PULLS_PER_PAGE = 30       # PyGithub's default page size for the PR listing
+CALLS_PER_PULL = 4        # full PR object, issue comments, review comments, issue events
+RATE_LIMIT_PER_HOUR = 5000
+
+
+def read_candidates(path):
+    """[(owner, repo)] from an `owner/repo` per line file or a CSV starting with `owner,repo` columns"""
+    candidates = []
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        for row in csv.reader(file):
+            fields = [f.strip() for f in row]
+            if not fields or not fields[0] or fields[0].startswith('#') or fields[0].lower() == 'owner':
+                continue
+            if '/' in fields[0]:
+                owner, _, repo = fields[0].partition('/')
+            elif len(fields) > 1:
+                owner, repo = fields[0], fields[1]
+            else:
+                continue
+            candidates.append((owner.strip(), repo.strip()))
+    return candidates
+
+
+def load_cache():
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_cache(cache):
+    os.makedirs(screening_output_dir, exist_ok=True)
+    with open(cache_file, 'w', encoding='utf-8') as file:
+        json.dump(cache, file, indent=1, sort_keys=True)
+
+
+def build_query(batch):
+    parts = []
+    for i, (owner, repo) in enumerate(batch):
+        parts.append(f'r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) {{{REPO_FIELDS}}}')
+    return "query {\n" + "\n".join(parts) + "\nrateLimit { cost remaining resetAt }\n}"
+
+
+def repo_info(node):
+    history = ((node.get("defaultBranchRef") or {}).get("target") or {})
+    travis = history.get("travis") or {"totalCount": 0, "nodes": []}
+    actions = history.get("actions") or {"totalCount": 0}
+    return {
+        "language": (node.get("primaryLanguage") or {}).get("name"),
+        "archived": node["isArchived"],
+        "prs": node["pullRequests"]["totalCount"],
+        "merged_prs": node["merged"]["totalCount"],
+        "tags": node["refs"]["totalCount"] if node.get("refs") else 0,
+        "travis": travis["totalCount"] > 0,
+        "travis_at_head": node.get("travisAtHead") is not None,
+        "travis_last_change": travis["nodes"][0]["committedDate"] if travis["nodes"] else None,
+        "actions": actions["totalCount"] > 0,
+        "actions_at_head": node.get("actionsAtHead") is not None,
+    }
+
+
+def fetch_batch(session, batch):
+    """
+    One GraphQL request for a batch of repos -> ({slug: info or None if not found},
+    {slug: error} for repos that could not be read this time). Raises RuntimeError if
+    the query failed as a whole.
+    """
+    response = session.post(GRAPHQL_URL, json={"query": build_query(batch)}, timeout=60)
+    response.raise_for_status()
+    body = response.json()
+    data = body.get("data")
+
+    # Errors with a path belong to one repo's alias: NOT_FOUND is cached as "not found",
+    # anything else (e.g. a blocked repo) only makes that repo unavailable. Errors
+    # without one (rate limit, timeout of the whole query) say nothing about the repos.
+    alias_errors = {}
+    for error in body.get("errors") or []:
+        path = error.get("path") or []
+        if not path or not re.fullmatch(r"r\d+", str(path[0])):
+            raise RuntimeError(f"GraphQL error: {error.get('type')}: {error.get('message')}")
+        if alias_errors.get(path[0]) != "NOT_FOUND":
+            alias_errors[path[0]] = error.get("type") or error.get("message")
+    if data is None:
+        raise RuntimeError("GraphQL response has no data")
+
+    rate = data.get("rateLimit")
+    if rate and rate["remaining"] < 100:
+        reset = datetime.fromisoformat(rate["resetAt"].replace("Z", "+00:00"))
+        wait = max((reset - datetime.now(timezone.utc)).total_seconds(), 0) + 1
+        print(f"GraphQL rate limit nearly used up, sleeping {wait:.0f}s")
+        time.sleep(wait)
+
+    results, unavailable = {}, {}
+    for i, (owner, repo) in enumerate(batch):
+        slug, error = f"{owner}/{repo}", alias_errors.get(f"r{i}")
+        if error == "NOT_FOUND":
+            results[slug] = None
+        elif error is not None:
+            unavailable[slug] = error
+        elif data.get(f"r{i}") is not None:
+            results[slug] = repo_info(data[f"r{i}"])
+    return results, unavailable
+
+
+def screen(candidates, batch_size=25, max_age_days=7, retries=3):
+    """
+    Counts for every candidate, from the cache where fresh enough. Candidates whose batch
+    kept failing, or that were unavailable, are left out of the result (and out of the cache).
+    """
+    import requests
+    from dotenv import load_dotenv
+
+    cache = load_cache()
+    now = time.time()
+
+    def is_stale(slug):
+        entry = cache.get(slug)
+        return (entry is None or entry.get("version") != CACHE_VERSION
+                or now - entry["fetched_at"] > max_age_days * 86400)
+
+    stale = [(o, r) for o, r in candidates if is_stale(f"{o}/{r}")]
+    print(f"{len(candidates) - len(stale)} candidates cached, querying {len(stale)}")
+
+    if stale:
+        load_dotenv()
+        token = os.getenv("GITHUB_TOKEN")
+        if not token:
+            print("Error: GITHUB_TOKEN not found in .env file")
+            sys.exit(1)
+        session = requests.Session()
+        session.headers["Authorization"] = f"bearer {token}"
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            results = None
+            for attempt in range(retries):
+                try:
+                    results, unavailable = fetch_batch(session, batch)
+                    break
+                except (requests.exceptions.RequestException, RuntimeError) as e:
+                    wait = 30 * 2 ** attempt
+                    print(f"GraphQL request failed for batch starting at {batch[0]}: {e}")
+                    if attempt + 1 < retries:
+                        print(f"Retrying in {wait}s")
+                        time.sleep(wait)
+            if results is None:
+                print(f"Giving up on batch starting at {batch[0]}, its repos stay unscreened")
+                continue
+            for slug, error in unavailable.items():
+                print(f"{slug} unavailable ({error}), will be queried again next run")
+            for slug, info in results.items():
+                cache[slug] = {"fetched_at": now, "version": CACHE_VERSION, "info": info}
+            save_cache(cache) # keep progress if a later batch fails
+
+    return {f"{o}/{r}": cache[f"{o}/{r}"]["info"] for o, r in candidates
+            if not is_stale(f"{o}/{r}")}
+
+
+def estimate_cost(info, workers=1, latency=0.3):
+    """(REST calls, hours) to mine a repo with collect_pulls.py"""
+    prs = info["prs"]
+    closed_unmerged = max(prs - info["merged_prs"], 0) # upper bound, open PRs don't need as_issue()
+    calls = math.ceil(prs / PULLS_PER_PAGE) + CALLS_PER_PULL * prs + closed_unmerged
+    rate_hours = calls / RATE_LIMIT_PER_HOUR
+    latency_hours = calls * latency / max(workers, 1) / 3600
+    return calls, max(rate_hours, latency_hours)
+
+
+def has_ci(info, require_ci):
+    if require_ci == "none":
+        return True
+    if require_ci == "any":
+        return info["travis"] or info["actions"]
+    return info[require_ci]
+
+
+def build_suite(candidates, infos, min_prs=100, max_prs=None, min_tags=5, require_ci="travis",
+                budget_hours=None, workers=1, latency=0.3, exclude_archived=False):
+    """Filter and rank candidates (cheapest first) and cut the list at the time budget"""
+    rows = []
+    for owner, repo in candidates:
+        if f"{owner}/{repo}" not in infos:
+            print(f"Skipping {owner}/{repo}: not screened")
+            continue
+        info = infos[f"{owner}/{repo}"]
+        if info is None:
+            print(f"Skipping {owner}/{repo}: not found")
+            continue
+        if (exclude_archived and info["archived"]) or info["prs"] < min_prs or info["tags"] < min_tags:
+            continue
+        if max_prs is not None and info["prs"] > max_prs:
+            continue
+        if not has_ci(info, require_ci):
+            continue
+        calls, hours = estimate_cost(info, workers, latency)
+        rows.append({"owner": owner, "repo": repo, "language": info["language"], "prs": info["prs"],
+                     "merged_prs": info["merged_prs"], "tags": info["tags"], "archived": info["archived"],
+                     "travis": info["travis"], "travis_at_head": info["travis_at_head"],
+                     "actions": info["actions"], "api_calls": calls, "hours": round(hours, 2)})
+
+    rows.sort(key=lambda r: (r["api_calls"], r["owner"], r["repo"]))
+    if budget_hours is not None:
+        suite, total = [], 0
+        for row in rows:
+            if total + row["hours"] > budget_hours:
+                break
+            suite.append(row)
+            total += row["hours"]
+        rows = suite
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen candidate repos before mining")
+    parser.add_argument("candidates", help="file with one owner/repo per line")
+    parser.add_argument("--min-prs", type=int, default=100)
+    parser.add_argument("--max-prs", type=int, default=None)
+    parser.add_argument("--min-tags", type=int, default=5)
+    parser.add_argument("--require-ci", choices=["travis", "actions", "any", "none"], default="travis",
+                        help="CI config that must appear in the default branch's history")
+    parser.add_argument("--exclude-archived", action="store_true", help="drop archived repos")
+    parser.add_argument("--budget-hours", type=float, default=None, help="stop adding repos past this projected time")
+    parser.add_argument("--workers", type=int, default=1, help="collect_pulls.py worker threads, for the time estimate")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per REST call, for the time estimate")
+    parser.add_argument("--batch", type=int, default=25, help="repos per GraphQL query")
+    parser.add_argument("--max-age", type=float, default=7, help="days before cached results are refreshed")
+    args = parser.parse_args()
+
+    candidates = read_candidates(args.candidates)
+    infos = screen(candidates, args.batch, args.max_age)
+    suite = build_suite(candidates, infos, args.min_prs, args.max_prs, args.min_tags, args.require_ci,
+                        args.budget_hours, args.workers, args.latency, args.exclude_archived)
+    if not suite:
+        print("No candidates passed the screening")
+        return
+
+    os.makedirs(screening_output_dir, exist_ok=True)
+    with open(suite_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=list(suite[0].keys()))
+        writer.writeheader()
+        writer.writerows(suite)
+
+    total_calls = sum(r["api_calls"] for r in suite)
+    total_hours = sum(r["hours"] for r in suite)
+    print(f"{len(suite)} of {len(candidates)} candidates selected: ~{total_calls} REST calls, "
+          f"~{total_hours:.1f} hours of PR mining with {args.workers} worker(s)")
+    print(f"Saved suite to {suite_file} (run with: python run.py --suite {os.path.relpath(suite_file)})")
+
+
+if __name__ == "__main__":
+    main()
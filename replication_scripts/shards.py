@@ -0,0 +1,283 @@
+"""
+Sharded execution of the mining pipeline (coordinator / worker / reduce)
+
+The coordinator splits repos into tasks on a work queue (see workqueue.py): one release
+linking task per repo and one PR mining task per repo, or per PR-number range with
+`shard_size`. Workers on any node claim tasks, heartbeat while running them, and write
+their output under outputs/shards/<repo>/. The reduce step combines the shards into the
+usual outputs/mined layout, merges PR and release data, and updates the results CSV.
+
+Used through run.py:
+    python run.py --coordinator [--shard-size 500] [<repo> <owner>]
+    python run.py --worker [--processes 4]
+    python run.py --reduce
+"""
+
+import os
+import csv
+import time
+import socket
+import shutil
+import threading
+import multiprocessing
+
+from workqueue import open_queue
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+output_dir = os.path.join(script_dir, '..', 'outputs')
+mined_output_dir = os.path.join(output_dir, 'mined')
+shard_output_dir = os.path.join(output_dir, 'shards')
+default_queue = os.path.join(output_dir, 'queue', 'queue.db')
+
+
+def repo_shard_dir(repo_name):
+    path = os.path.join(shard_output_dir, repo_name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# Files collect_release_info keeps per repo (the indexes make the next run incremental)
+RELEASE_STATE_FILES = ("releases_raw.csv", "releases_linked.csv", "tag_index.csv", "commit_index.json")
+
+
+def release_shard_files(repo_name):
+    return [os.path.join(shard_output_dir, repo_name, f'{repo_name}_{suffix}.csv')
+            for suffix in ("releases_raw", "releases_linked")]
+
+
+def latest_pull_number(owner, repo_name):
+    """Highest PR number in the repo (one API call)"""
+    from dotenv import load_dotenv
+    from github import Github, Auth
+
+    load_dotenv()
+    git = Github(auth=Auth.Token(os.getenv("GITHUB_TOKEN")))
+    pulls = git.get_repo(f"{owner}/{repo_name}").get_pulls(state='all', sort='created', direction='desc')
+    try:
+        latest = pulls[0].number
+    except IndexError:
+        latest = 0
+    git.close()
+    return latest
+
+
+def enqueue_repos(queue, repos, shard_size=None):
+    """Coordinator: put the release and PR tasks for each (owner, repo) on the queue"""
+    added = 0
+    for owner, repo in repos:
+        added += queue.put("releases", {"owner": owner, "repo": repo}, key=f"releases:{owner}/{repo}")
+        if shard_size:
+            latest = latest_pull_number(owner, repo)
+            for low in range(1, latest + 1, shard_size):
+                high = min(low + shard_size - 1, latest)
+                payload = {"owner": owner, "repo": repo, "low": low, "high": high}
+                added += queue.put("pulls", payload, key=f"pulls:{owner}/{repo}:{low}-{high}")
+        else:
+            payload = {"owner": owner, "repo": repo, "low": None, "high": None}
+            added += queue.put("pulls", payload, key=f"pulls:{owner}/{repo}:all")
+    print(f"Queued {added} new tasks, queue status: {queue.counts()}")
+
+
+def run_pulls_task(payload, staging_dir):
+    from collect_pulls import collect_pull_requests
+
+    low, high = payload["low"], payload["high"]
+    name = f"pulls_{low}_{high}.csv" if low is not None else "pulls_all.csv"
+    output_file = os.path.join(repo_shard_dir(payload["repo"]), name)
+    numbers = (low, high) if low is not None else None
+    collect_pull_requests(payload["owner"], payload["repo"], numbers=numbers,
+                          output_file=os.path.join(staging_dir, name))
+    return {"file": output_file}, [output_file]
+
+
+def run_releases_task(payload, staging_dir):
+    from collect_releases import collect_release_info
+
+    repo = payload["repo"]
+    shard_dir = repo_shard_dir(repo)
+    # Start from the previous run's files so linking stays incremental
+    outputs = [os.path.join(shard_dir, f'{repo}_{suffix}') for suffix in RELEASE_STATE_FILES]
+    for path in outputs:
+        if os.path.exists(path):
+            shutil.copyfile(path, os.path.join(staging_dir, os.path.basename(path)))
+    collect_release_info(payload["owner"], repo, output_dir=staging_dir)
+    # collect_release_info returns without writing anything when there is nothing to link;
+    # fail the task so it is retried instead of reduce treating the repo as linked
+    missing = [os.path.basename(f) for f in release_shard_files(repo)
+               if not os.path.exists(os.path.join(staging_dir, os.path.basename(f)))]
+    if missing:
+        raise RuntimeError(f"Release linking for {payload['owner']}/{repo} wrote no {', '.join(missing)}")
+    return {"dir": shard_dir}, outputs
+
+
+# Task kind -> function(payload, staging_dir) returning (JSON-serializable result, output paths).
+# Outputs are written to staging_dir under their base name and only moved to the output
+# paths once the task is completed, so a worker that lost its lease never overwrites them.
+HANDLERS = {
+    "pulls": run_pulls_task,
+    "releases": run_releases_task,
+}
+
+
+class Heartbeat(threading.Thread):
+    """Keeps a lease alive while the task runs; `lost` is set once the lease can't be trusted"""
+
+    def __init__(self, queue, task, worker_id, lease_seconds):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.task = task
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        renewed = time.time()
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.task.id, self.worker_id, self.lease_seconds):
+                    print(f"Lost lease on {self.task}")
+                    self.lost.set()
+                    return
+                renewed = time.time()
+            except Exception as e:  # e.g. database locked, try again on the next beat
+                print(f"Heartbeat for {self.task} failed: {e!r}")
+                if time.time() - renewed >= self.lease_seconds:
+                    print(f"Lease on {self.task} expired")
+                    self.lost.set()
+                    return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def work(queue_url=default_queue, worker_id=None, lease_seconds=300, poll_seconds=5, wait=False):
+    """
+    Worker loop: claim, run and report tasks until the queue is drained
+    (or forever with `wait`, for long-lived workers on other nodes).
+    """
+    queue = open_queue(queue_url)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    done = 0
+    while True:
+        task = queue.claim(worker_id, lease_seconds)
+        if task is None:
+            if queue.is_drained() and not wait:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"[{worker_id}] {task} (attempt {task.attempts})")
+        staging_dir = os.path.join(repo_shard_dir(task.payload["repo"]),
+                                   f".attempt-{task.id}-{task.attempts}-{worker_id}")
+        os.makedirs(staging_dir, exist_ok=True)
+        heartbeat = Heartbeat(queue, task, worker_id, lease_seconds)
+        heartbeat.start()
+        try:
+            try:
+                result, outputs = HANDLERS[task.kind](task.payload, staging_dir)
+            except (Exception, SystemExit) as e:  # the collect scripts sys.exit on errors
+                heartbeat.stop()
+                print(f"[{worker_id}] {task} failed: {e!r}")
+                queue.fail(task.id, worker_id, repr(e))
+                continue
+            heartbeat.stop()
+            if heartbeat.lost.is_set() or not queue.complete(task.id, worker_id, result):
+                print(f"[{worker_id}] {task} finished after its lease was lost, discarding its output")
+                continue
+            for path in outputs:
+                staged = os.path.join(staging_dir, os.path.basename(path))
+                if os.path.exists(staged):
+                    os.replace(staged, path)
+            done += 1
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    print(f"[{worker_id}] finished {done} tasks")
+    return done
+
+
+def start_workers(processes, queue_url=default_queue, lease_seconds=300, wait=False):
+    """Run several local worker processes and wait for them"""
+    workers = [multiprocessing.Process(target=work, args=(queue_url, None, lease_seconds, 5, wait))
+               for _ in range(processes)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+
+
+def combine_pull_shards(files, output_file):
+    """Concatenate PR shard CSVs, newest PR first like a single-process run"""
+    rows = []
+    fields = None
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            fields = fields or reader.fieldnames
+            rows.extend(reader)
+    rows.sort(key=lambda r: int(r["pull_number"]), reverse=True)
+    with open(output_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def reduce(queue_url=default_queue, results_file=None):
+    """Merge finished shards into outputs/mined and run the analysis for each complete repo"""
+    from merge import consolidate_data
+    from metrics import dataSetup, analysis
+
+    queue = open_queue(queue_url)
+    if not queue.is_drained():
+        print(f"Queue still has work, try again later: {queue.counts()}")
+        return
+
+    failed = set()
+    for kind, payload, error in queue.failures():
+        print(f"Failed {kind} task {payload}: {error}")
+        failed.add((payload["owner"], payload["repo"]))
+
+    pull_files = {}
+    linked = set()
+    for payload, result in queue.results("pulls"):
+        pull_files.setdefault((payload["owner"], payload["repo"]), []).append(result["file"])
+    for payload, result in queue.results("releases"):
+        linked.add((payload["owner"], payload["repo"]))
+
+    results_file = results_file or os.path.join(output_dir, "results_from_minned_data.csv")
+    os.makedirs(mined_output_dir, exist_ok=True)
+    for owner, repo in sorted(pull_files):
+        if (owner, repo) in failed or (owner, repo) not in linked:
+            print(f"Skipping {owner}/{repo}: not all of its shards finished")
+            continue
+
+        release_files = release_shard_files(repo)
+        if not all(os.path.exists(f) for f in release_files):
+            # Never fall back to whatever is in outputs/mined, it may be from an older run
+            print(f"Skipping {owner}/{repo}: release shard files are missing")
+            continue
+        if not all(os.path.exists(f) for f in pull_files[(owner, repo)]):
+            print(f"Skipping {owner}/{repo}: PR shard files are missing")
+            continue
+
+        combine_pull_shards(pull_files[(owner, repo)], os.path.join(mined_output_dir, f'{repo}_pulls_raw.csv'))
+        for shard_file in release_files:
+            shutil.copyfile(shard_file, os.path.join(mined_output_dir, os.path.basename(shard_file)))
+
+        try:
+            consolidate_data(owner, repo)
+        except SystemExit:  # merge.py exits when an input is missing, keep reducing the others
+            print(f"Skipping {owner}/{repo}: could not merge its PR and release data")
+            continue
+        try:
+            setup = dataSetup(repo, owner)
+        except SystemExit:  # no CI start date (not hardcoded and the Travis API gave none)
+            print(f"Skipping {owner}/{repo}: could not set up the before/after CI split")
+            continue
+        if setup is None:
+            continue
+        before_ci, after_ci = setup
+        analysis(before_ci, after_ci, repo, results_file)
+        print(f"Reduced {owner}/{repo}")
@@ -0,0 +1,270 @@
+"""
+Streaming Quantile Summaries
+
+Builds a mergeable t-digest per project x practice x metric (t1, t2, lifetime) while PRs
+go through `dataSetup` / `dataSetup_from_original_datasets`, and persists them as JSON.
+Percentiles per language, per cohort or for the whole corpus are then answered by merging
+the stored digests, without re-reading the raw data.
+
+Usage:
+    python sketches.py build [--source mined|original]
+    python sketches.py query [--source mined|original] [--by corpus|language|project] [--cohort <file>] [--q 0.5 0.9]
+
+Example:
+    python sketches.py build --source original
+    python sketches.py query --source original --by language --q 0.25 0.5 0.75
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import argparse
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sketch_output_dir = os.path.join(script_dir, '..', 'outputs', 'sketches')
+dataset_dir = os.path.join(script_dir, '..', 'datasets')
+language_file = os.path.join(dataset_dir, 'wilcoxon_test_and_cliffs_delta_result_for_rq1.csv')
+
+METRICS = {
+    "delivery delay": "t2",
+    "merge time": "t1",
+    "PR lifetime": "lifetime"
+}
+
+
+class TDigest:
+    """
+    Merging t-digest (k1 scale function). Quantiles interpolate between centroid midpoints,
+    so even small inputs give estimates rather than exact order statistics
+    (p25 of [1..5] is 1.75).
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []  # sorted [mean, weight]
+        self.buffer = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1):
+        self.buffer.append((value, weight))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.buffer) >= 5 * self.compression:
+            self._compress()
+
+    def add_many(self, values):
+        for value in values:
+            self.add(float(value))
+
+    def merge(self, other):
+        """Fold another digest into this one"""
+        if other.count == 0:
+            return self
+        other._compress()
+        self.buffer.extend((m, w) for m, w in other.centroids)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q(self, k):
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _q_limit(self, q):
+        """Highest quantile the centroid starting at `q` may reach (one unit of k, capped at q = 1)"""
+        return self._q(min(self._k(q) + 1, self.compression / 4))
+
+    def _compress(self):
+        if not self.buffer:
+            return
+        points = sorted([tuple(c) for c in self.centroids] + self.buffer)
+        self.buffer = []
+        total = self.count
+        merged = []
+        mean, weight = points[0]
+        weight_so_far = 0
+        q_limit = self._q_limit(0)
+        for m, w in points[1:]:
+            if (weight_so_far + weight + w) / total <= q_limit:
+                weight += w
+                mean += (m - mean) * w / weight
+            else:
+                merged.append([mean, weight])
+                weight_so_far += weight
+                q_limit = self._q_limit(min(weight_so_far / total, 1.0))
+                mean, weight = m, w
+        merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        self._compress()
+        if self.count == 0:
+            return None
+        if len(self.centroids) == 1 or q <= 0:
+            return self.min if q <= 0 else self.centroids[0][0]
+        if q >= 1:
+            return self.max
+
+        target = q * self.count
+        cumulative = 0
+        prev_mid, prev_mean = 0, self.min
+        for mean, weight in self.centroids:
+            mid = cumulative + weight / 2
+            if target < mid:
+                if mid == prev_mid:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_mid) / (mid - prev_mid)
+            cumulative += weight
+            prev_mid, prev_mean = mid, mean
+        if self.count == prev_mid:
+            return self.max
+        return prev_mean + (self.max - prev_mean) * (target - prev_mid) / (self.count - prev_mid)
+
+    def to_dict(self):
+        self._compress()
+        return {"compression": self.compression, "count": self.count,
+                "min": self.min, "max": self.max, "centroids": self.centroids}
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data["compression"])
+        digest.count = data["count"]
+        digest.min = data["min"]
+        digest.max = data["max"]
+        digest.centroids = [list(c) for c in data["centroids"]]
+        return digest
+
+
+class SketchStore:
+    """Digests keyed by (project, practice, metric), persisted to one JSON file per data source."""
+
+    def __init__(self, source="mined", compression=100):
+        self.source = source
+        self.compression = compression
+        self.sketches = {}
+        self.path = os.path.join(sketch_output_dir, f'sketches_{source}.json')
+
+    def update(self, project, practice, df):
+        """Stream the t1/t2/lifetime columns of one PR group into its digests"""
+        for metric_name, col in METRICS.items():
+            if col not in df.columns:
+                continue
+            digest = TDigest(self.compression)
+            digest.add_many(df[col].dropna())
+            if digest.count == 0:
+                continue
+            self.sketches[(project, practice, metric_name)] = digest
+
+    def save(self):
+        """Write the digests, keeping entries for projects not touched in this run"""
+        existing = SketchStore.load(self.source).sketches if os.path.exists(self.path) else {}
+        existing.update(self.sketches)
+        os.makedirs(sketch_output_dir, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump([{"project": p, "practice": pr, "metric": m, **d.to_dict()}
+                       for (p, pr, m), d in sorted(existing.items())], file)
+        print(f"Saved {len(existing)} sketches to {self.path}")
+
+    @classmethod
+    def load(cls, source="mined"):
+        store = cls(source)
+        with open(store.path, 'r', encoding='utf-8') as file:
+            for entry in json.load(file):
+                key = (entry.pop("project"), entry.pop("practice"), entry.pop("metric"))
+                store.sketches[key] = TDigest.from_dict(entry)
+        return store
+
+    def combine(self, group_of):
+        """
+        Merge digests into groups. `group_of(project)` returns a group name, or None to skip.
+        Returns {(group, practice, metric): TDigest}.
+        """
+        combined = {}
+        for (project, practice, metric), digest in self.sketches.items():
+            group = group_of(project)
+            if group is None:
+                continue
+            key = (group, practice, metric)
+            combined.setdefault(key, TDigest(self.compression)).merge(digest)
+        return combined
+
+
+def load_languages():
+    """Project -> language, from the authors' RQ1 results file"""
+    languages = {}
+    with open(language_file, 'r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            languages[row['project']] = row['language']
+    return languages
+
+
+def build(source):
+    from metrics import dataSetup, dataSetup_from_original_datasets, mine_suite2
+
+    store = SketchStore(source)
+    if source == "original":
+        pr_dataset = os.path.join(dataset_dir, 'pull_requests_meta_data.csv')
+        releases_dataset = os.path.join(dataset_dir, 'releases_meta_data.csv')
+        dataSetup_from_original_datasets(pr_dataset, releases_dataset, sketches=store)
+    else:
+        for owner, repo in mine_suite2:
+            dataSetup(repo, owner, sketches=store)
+    store.save()
+
+
+def query(source, by, quantiles, cohort_file=None):
+    store = SketchStore.load(source)
+
+    if cohort_file:
+        with open(cohort_file, 'r', encoding='utf-8') as file:
+            cohort = {line.strip() for line in file if line.strip()}
+        name = os.path.splitext(os.path.basename(cohort_file))[0]
+        group_of = lambda project: name if project in cohort else None
+    elif by == "language":
+        languages = load_languages()
+        group_of = lambda project: languages.get(project, "unknown")
+    elif by == "project":
+        group_of = lambda project: project
+    else:
+        group_of = lambda project: "corpus"
+
+    fields = ["group", "practice", "metric", "count"] + [f"p{round(q * 100, 1):g}" for q in quantiles]
+    writer = csv.DictWriter(sys.stdout, fieldnames=fields)
+    writer.writeheader()
+    for (group, practice, metric), digest in sorted(store.combine(group_of).items()):
+        row = {"group": group, "practice": practice, "metric": metric, "count": digest.count}
+        for q, field in zip(quantiles, fields[4:]):
+            row[field] = digest.quantile(q)
+        writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantile sketches of merge time and delivery delay")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="stream PRs through dataSetup and save the sketches")
+    build_parser.add_argument("--source", choices=["mined", "original"], default="mined")
+    query_parser = sub.add_parser("query", help="combine saved sketches and print percentiles")
+    query_parser.add_argument("--source", choices=["mined", "original"], default="mined")
+    query_parser.add_argument("--by", choices=["corpus", "language", "project"], default="corpus")
+    query_parser.add_argument("--cohort", help="file with one project per line")
+    query_parser.add_argument("--q", type=float, nargs="+", default=[0.25, 0.5, 0.75, 0.9])
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.source)
+    else:
+        query(args.source, args.by, args.q, args.cohort)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+CI Cutoff Sensitivity Sweep
+
+The CI adoption date used by `dataSetup` is uncertain (Travis API vs hardcoded vs the
+commit adding the config file can differ by months). This re-evaluates the RQ1 statistics
+for a grid of cutoffs around the adoption date, optionally leaving out an exclusion window
+of PRs on either side of the cutoff, and writes a per-repo stability curve.
+
+PRs are sorted by `creation_date` once; as the cutoff moves forward PRs only ever move
+from the after-CI sample into the before-CI sample, so the rank-sum state is updated
+incrementally (see rankstats.py) instead of re-running the tests for every grid point.
+At the edges of the grid, where one side has only a few PRs, the p-value comes from
+`mannwhitneyu` (exact test), so every row agrees with `metrics.analysis` on that split.
+
+Usage:
+    python sweep.py <owner> <repo> [--span 365] [--step 7] [--exclusion 0 30 90]
+
+Example:
+    python sweep.py Pylons pyramid --exclusion 0 30
+"""
+
+import os
+import sys
+import csv
+import argparse
+
+from rankstats import TwoSampleRanks
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sweep_output_dir = os.path.join(script_dir, '..', 'outputs', 'sweep')
+
+DAY = 86400
+METRICS = {
+    "delivery delay": "t2",
+    "merge time": "t1",
+    "PR lifetime": "lifetime"
+}
+
+
+def sweep_metric(items, cutoffs, exclusion):
+    """
+    Evaluate one metric over all cutoffs for a single exclusion window.
+
+    Args:
+        items: list of (creation_timestamp, value), sorted by timestamp
+        cutoffs: ascending list of cutoff timestamps
+        exclusion: seconds left out on each side of the cutoff
+
+    Returns a list of (n_before, n_after, delta, p_value), one per cutoff.
+    """
+    state = TwoSampleRanks([value for _, value in items])
+    results = []
+    if not cutoffs:
+        return results
+
+    # Before = created < cutoff - exclusion, after = created >= cutoff + exclusion
+    b = 0
+    while b < len(items) and items[b][0] < cutoffs[0] - exclusion:
+        state.add_first(items[b][1])
+        b += 1
+    a = b
+    while a < len(items) and items[a][0] < cutoffs[0] + exclusion:
+        a += 1
+    for _, value in items[a:]:
+        state.add_second(value)
+
+    for cutoff in cutoffs:
+        while a < len(items) and items[a][0] < cutoff + exclusion:
+            state.remove_second(items[a][1])
+            a += 1
+        while b < len(items) and items[b][0] < cutoff - exclusion:
+            state.add_first(items[b][1])
+            b += 1
+        results.append((state.n_first, state.n_second, state.cliffs_delta(), state.p_value()))
+
+    return results
+
+
+def sweep_repo(data, ci_start_date, span_days=365, step_days=7, exclusions=(0,)):
+    """
+    Run the sweep on a DataFrame from `load_mined_data` and return the stability curve rows.
+    """
+    import pandas as pd
+    from metrics import cliff_magnitude
+
+    epoch = pd.Timestamp(0, tz="UTC")
+    created = (data['creation_date'] - epoch).dt.total_seconds()
+    ci_ts = ci_start_date.timestamp()
+
+    offsets = list(range(-span_days, span_days + 1, step_days))
+    if 0 not in offsets:
+        offsets = sorted(offsets + [0])
+    cutoffs = [ci_ts + offset * DAY for offset in offsets]
+
+    # Sort once per metric (each metric drops its own missing values)
+    items = {}
+    for metric_name, col in METRICS.items():
+        pairs = [(ts, v) for ts, v in zip(created, data[col]) if pd.notna(ts) and pd.notna(v)]
+        pairs.sort()
+        items[metric_name] = pairs
+
+    rows = []
+    for exclusion_days in exclusions:
+        per_metric = {name: sweep_metric(items[name], cutoffs, exclusion_days * DAY) for name in METRICS}
+        for i, offset in enumerate(offsets):
+            row = {
+                "offset_days": offset,
+                "exclusion_days": exclusion_days,
+                "cutoff": pd.Timestamp(cutoffs[i], unit="s", tz="UTC").isoformat(),
+            }
+            for metric_name in METRICS:
+                n_before, n_after, delta, p_value = per_metric[metric_name][i]
+                row[f"n before: {metric_name}"] = n_before
+                row[f"n after: {metric_name}"] = n_after
+                row[f"Cliff delta (magnitude): {metric_name}"] = cliff_magnitude(delta)
+                row[f"Cliff delta (estimate): {metric_name}"] = "" if delta is None else format(delta, ".10f")
+                row[f"MWW test (p-value): {metric_name}"] = "" if p_value is None else format(p_value, ".10f")
+            rows.append(row)
+
+    return rows
+
+
+def summarize_stability(rows):
+    """Share of grid points (per exclusion window) that agree with the cutoff at offset 0"""
+    summary = {}
+    for exclusion_days in sorted({r["exclusion_days"] for r in rows}):
+        group = [r for r in rows if r["exclusion_days"] == exclusion_days]
+        baseline = next(r for r in group if r["offset_days"] == 0)
+        for metric_name in METRICS:
+            def significant(r):
+                p = r[f"MWW test (p-value): {metric_name}"]
+                return p != "" and float(p) < 0.05
+            same = [r for r in group
+                    if r[f"Cliff delta (magnitude): {metric_name}"] == baseline[f"Cliff delta (magnitude): {metric_name}"]
+                    and significant(r) == significant(baseline)]
+            summary[(exclusion_days, metric_name)] = len(same) / len(group)
+    return summary
+
+
+def run_sweep(owner, repo_name, span_days=365, step_days=7, exclusions=(0,)):
+    from metrics import first_CI_by_TRAVIS_API, load_mined_data
+
+    ci_start_date = first_CI_by_TRAVIS_API(owner, repo_name)
+    if ci_start_date is None:
+        print("CI start date not found, Run first_CI_by_TRAVIS_API on the repo/s to check")
+        sys.exit(1)
+    data = load_mined_data(repo_name)
+    if data is None:
+        return
+
+    rows = sweep_repo(data, ci_start_date, span_days, step_days, exclusions)
+
+    os.makedirs(sweep_output_dir, exist_ok=True)
+    output_file = os.path.join(sweep_output_dir, f'{repo_name}_stability.csv')
+    with open(output_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Stability of {owner}/{repo_name} around {ci_start_date} (+/-{span_days} days, step {step_days}):")
+    for (exclusion_days, metric_name), share in summarize_stability(rows).items():
+        print(f"  exclusion {exclusion_days:>3}d  {metric_name:<15} {share:.0%} of cutoffs agree with baseline")
+    print(f"Saved stability curve to {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CI cutoff sensitivity sweep for RQ1")
+    parser.add_argument("owner")
+    parser.add_argument("repo")
+    parser.add_argument("--span", type=int, default=365, help="days before/after the CI date to sweep")
+    parser.add_argument("--step", type=int, default=7, help="days between cutoffs")
+    parser.add_argument("--exclusion", type=int, nargs="+", default=[0],
+                        help="days of PRs left out on each side of the cutoff")
+    args = parser.parse_args()
+
+    run_sweep(args.owner, args.repo, args.span, args.step, args.exclusion)
+
+
+if __name__ == "__main__":
+    main()
@@ -95,5 +95,5 @@ def merge_projects_both_files(your_file, authors_file, output_combined_file):
     final_df.to_csv(output_combined_file, index=False)
     print(f"Comparison results saved in {output_combined_file}")
 
-# Example usage
-merge_projects_both_files(calculated_file, dataset_file, combined_file)
+if __name__ == "__main__":
+    merge_projects_both_files(calculated_file, dataset_file, combined_file)
@@ -0,0 +1,254 @@
+"""
+Travis Build History Miner
+
+`first_CI_by_TRAVIS_API` only asks for one build to date CI adoption. This pages through
+the full `/repo/{slug}/builds` history of many repos concurrently (asyncio + one pooled
+aiohttp session), retrying on rate limits and server errors, and stores each repo's builds
+as a gzipped CSV with only the columns we use.
+
+The builds are then joined to the mined PRs to get per-PR CI features:
+    - PR builds (Travis `pull_request_number`): count, pass rate, median duration
+    - merge commit build (`merge_sha` from the release linker): its state
+    - as-of merge time: state of the last finished build, and build count / pass rate over
+      the `window_days` before the merge
+
+Usage:
+    python travis_builds.py mine <owner> <repo> [<owner> <repo> ...] [--concurrency 8] [--api-url URL]
+    python travis_builds.py features <owner> <repo> [--window-days 7]
+
+Example:
+    python travis_builds.py mine Pylons pyramid mizzy serverspec
+    python travis_builds.py features Pylons pyramid
+"""
+
+import os
+import sys
+import csv
+import gzip
+import asyncio
+import argparse
+from urllib.parse import quote
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+travis_output_dir = os.path.join(script_dir, '..', 'outputs', 'travis')
+mined_output_dir = os.path.join(script_dir, '..', 'outputs', 'mined')
+
+API_URL = "https://api.travis-ci.com"
+PAGE_SIZE = 100
+BUILD_FIELDS = ["id", "number", "state", "event_type", "pull_request_number", "branch",
+                "commit_sha", "started_at", "finished_at", "duration"]
+
+
+def builds_file(repo_name):
+    return os.path.join(travis_output_dir, f'{repo_name}_builds.csv.gz')
+
+
+def compact_build(build):
+    """Keep only the fields used for the CI features"""
+    return {
+        "id": build.get("id"),
+        "number": build.get("number"),
+        "state": build.get("state"),
+        "event_type": build.get("event_type"),
+        "pull_request_number": build.get("pull_request_number"),
+        "branch": (build.get("branch") or {}).get("name"),
+        "commit_sha": (build.get("commit") or {}).get("sha"),
+        "started_at": build.get("started_at"),
+        "finished_at": build.get("finished_at"),
+        "duration": build.get("duration"),
+    }
+
+
+async def fetch_json(session, semaphore, url, params, retries=5):
+    """GET with a shared concurrency limit; waits out rate limits and retries server errors"""
+    import aiohttp
+
+    delay = 1
+    for attempt in range(retries):
+        async with semaphore:
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status == 429 or (response.status == 403 and "Retry-After" in response.headers):
+                        wait = float(response.headers.get("Retry-After", delay))
+                        print(f"Rate limited on {url}, waiting {wait:.0f}s")
+                    elif response.status >= 500:
+                        wait = delay
+                        print(f"Server error {response.status} on {url}, retrying in {wait:.0f}s")
+                    else:
+                        response.raise_for_status()
+                        return await response.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                wait = delay
+                print(f"Request to {url} failed ({e!r}), retrying in {wait:.0f}s")
+        await asyncio.sleep(wait)
+        delay = min(delay * 2, 60)
+    raise RuntimeError(f"Giving up on {url} after {retries} attempts")
+
+
+async def fetch_repo_builds(session, semaphore, api_url, owner, repo_name):
+    """All builds of one repo: the first page gives the total, the other pages are fetched concurrently"""
+    url = f"{api_url}/repo/{quote(f'{owner}/{repo_name}', safe='')}/builds"
+    params = {"limit": PAGE_SIZE, "offset": 0, "sort_by": "started_at:asc"}
+    first = await fetch_json(session, semaphore, url, params)
+    total = first.get("@pagination", {}).get("count", len(first.get("builds", [])))
+
+    pages = await asyncio.gather(*[
+        fetch_json(session, semaphore, url, {**params, "offset": offset})
+        for offset in range(PAGE_SIZE, total, PAGE_SIZE)
+    ])
+    builds = [compact_build(b) for page in [first] + pages for b in page.get("builds", [])]
+    return builds
+
+
+def save_builds(repo_name, builds):
+    os.makedirs(travis_output_dir, exist_ok=True)
+    with gzip.open(builds_file(repo_name), 'wt', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=BUILD_FIELDS)
+        writer.writeheader()
+        writer.writerows(builds)
+
+
+async def mine_builds_async(repos, api_url=API_URL, token=None, concurrency=8):
+    import aiohttp
+
+    headers = {"Travis-API-Version": "3"}
+    if token:
+        headers["Authorization"] = f"token {token}"
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout) as session:
+        async def one(owner, repo_name):
+            try:
+                builds = await fetch_repo_builds(session, semaphore, api_url, owner, repo_name)
+            except Exception as e:
+                print(f"Could not mine builds for {owner}/{repo_name}: {e}")
+                return 0
+            save_builds(repo_name, builds)
+            print(f"Saved {len(builds)} builds for {owner}/{repo_name}")
+            return len(builds)
+
+        counts = await asyncio.gather(*[one(owner, repo) for owner, repo in repos])
+    return dict(zip(repos, counts))
+
+
+def mine_builds(repos, api_url=API_URL, concurrency=8):
+    """Mine the build history of [(owner, repo)] and save one file per repo"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    token = os.getenv("TRAVIS_TOKEN")
+    if not token:
+        print("TRAVIS_TOKEN not set, trying without authentication")
+    return asyncio.run(mine_builds_async(repos, api_url, token, concurrency))
+
+
+def load_builds(repo_name):
+    import pandas as pd
+
+    builds = pd.read_csv(builds_file(repo_name), compression='gzip')
+    builds['started_at'] = pd.to_datetime(builds['started_at'], utc=True)
+    builds['finished_at'] = pd.to_datetime(builds['finished_at'], utc=True)
+    builds['passed'] = (builds['state'] == 'passed').astype(int)
+    return builds
+
+
+def pr_ci_features(pulls, builds, linked=None, window_days=7):
+    """
+    Per-PR CI features from the PR DataFrame (pull_number, merged_at) and the builds.
+    `linked` (pull_number, merge_sha) adds the state of the merge commit's build.
+    """
+    import numpy as np
+    import pandas as pd
+
+    features = pulls[['pull_number', 'merged_at']].copy()
+    features['merged_at'] = pd.to_datetime(features['merged_at'], utc=True)
+
+    # Builds triggered for the PR itself
+    pr_builds = builds.dropna(subset=['pull_request_number'])
+    per_pr = pr_builds.groupby(pr_builds['pull_request_number'].astype(int)).agg(
+        pr_builds=('id', 'size'),
+        pr_build_pass_rate=('passed', 'mean'),
+        pr_build_median_duration=('duration', 'median'),
+    )
+    features = features.merge(per_pr, left_on='pull_number', right_index=True, how='left')
+    features['pr_builds'] = features['pr_builds'].fillna(0).astype(int)
+
+    # Build of the merge commit (by SHA)
+    if linked is not None and 'merge_sha' in linked.columns:
+        by_sha = builds.dropna(subset=['commit_sha']).sort_values('finished_at').drop_duplicates('commit_sha', keep='last')
+        merge_builds = linked[['pull_number', 'merge_sha']].merge(
+            by_sha[['commit_sha', 'state']], left_on='merge_sha', right_on='commit_sha', how='inner')
+        features = features.merge(merge_builds[['pull_number', 'state']].rename(columns={'state': 'merge_build_state'}),
+                                  on='pull_number', how='left')
+
+    # As-of merge time: last finished build and the builds in the window before the merge
+    finished = builds.dropna(subset=['finished_at']).sort_values('finished_at')
+    merged = features.dropna(subset=['merged_at']).sort_values('merged_at')
+    last = pd.merge_asof(merged[['pull_number', 'merged_at']],
+                         finished[['finished_at', 'state']].rename(columns={'state': 'last_build_state'}),
+                         left_on='merged_at', right_on='finished_at', direction='backward')
+    last['minutes_since_last_build'] = (last['merged_at'] - last['finished_at']).dt.total_seconds() / 60
+
+    times = finished['finished_at'].to_numpy(dtype='datetime64[ns]')
+    passed_cum = np.concatenate([[0], np.cumsum(finished['passed'].to_numpy())])
+    merge_times = last['merged_at'].to_numpy(dtype='datetime64[ns]')
+    hi = np.searchsorted(times, merge_times, side='right')
+    lo = np.searchsorted(times, merge_times - np.timedelta64(window_days, 'D'), side='left')
+    last['builds_before_merge'] = hi - lo
+    with np.errstate(invalid='ignore', divide='ignore'):
+        last['pass_rate_before_merge'] = np.where(hi > lo, (passed_cum[hi] - passed_cum[lo]) / (hi - lo), np.nan)
+
+    features = features.merge(last.drop(columns=['merged_at', 'finished_at']), on='pull_number', how='left')
+    return features
+
+
+def run_features(owner, repo_name, window_days=7):
+    import pandas as pd
+
+    if not os.path.exists(builds_file(repo_name)):
+        print(f"No builds for {owner}/{repo_name}, run `python travis_builds.py mine {owner} {repo_name}` first")
+        sys.exit(1)
+    pulls = pd.read_csv(os.path.join(mined_output_dir, f"{repo_name}_pulls_raw.csv"))
+    linked_file = os.path.join(mined_output_dir, f"{repo_name}_releases_linked.csv")
+    linked = pd.read_csv(linked_file) if os.path.exists(linked_file) else None
+
+    features = pr_ci_features(pulls, load_builds(repo_name), linked, window_days)
+    output_file = os.path.join(travis_output_dir, f'{repo_name}_pr_ci_features.csv')
+    features.drop(columns=['merged_at']).to_csv(output_file, index=False)
+    print(f"Saved CI features for {len(features)} PRs to {output_file}")
+
+
+def add_ci_features(data, repo_name):
+    """Attach the saved per-PR CI features to a DataFrame with pull_number (e.g. from load_mined_data)"""
+    import pandas as pd
+
+    features = pd.read_csv(os.path.join(travis_output_dir, f'{repo_name}_pr_ci_features.csv'))
+    return data.merge(features, on='pull_number', how='left')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Travis build history and per-PR CI features")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mine_parser = sub.add_parser("mine", help="download the build history of one or more repos")
+    mine_parser.add_argument("repos", nargs="+", help="<owner> <repo> pairs")
+    mine_parser.add_argument("--concurrency", type=int, default=8, help="requests in flight across all repos")
+    mine_parser.add_argument("--api-url", default=API_URL, help="Travis API base URL (e.g. a local stand-in)")
+    features_parser = sub.add_parser("features", help="join builds to the mined PRs")
+    features_parser.add_argument("owner")
+    features_parser.add_argument("repo")
+    features_parser.add_argument("--window-days", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == "mine":
+        if len(args.repos) % 2:
+            parser.error("give <owner> <repo> pairs")
+        repos = list(zip(args.repos[::2], args.repos[1::2]))
+        mine_builds(repos, args.api_url.rstrip('/'), args.concurrency)
+    else:
+        run_features(args.owner, args.repo, args.window_days)
+
+
+if __name__ == "__main__":
+    main()
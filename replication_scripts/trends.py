@@ -0,0 +1,187 @@
+"""
+Rolling-Window Trend Analysis
+
+RQ1 in `metrics.analysis` gives one before/after comparison per repo. This splits each
+repo's PRs into calendar windows (monthly or quarterly) by `creation_date` and reports,
+for every window, the median merge time (t1), delivery delay (t2) and lifetime, plus the
+MWW p-value and Cliff's delta against the previous, adjacent window. The p-values are the
+ones `mannwhitneyu` gives in `metrics.analysis`, including its exact test for windows with
+few PRs.
+
+The window pair slides over the PRs sorted by date once; values enter and leave an
+order-statistic tree (see rankstats.py) instead of each window being recomputed.
+
+Usage:
+    python trends.py <owner> <repo> [--freq M|Q] [--step <months>]
+    python trends.py --original <date_column> [--freq M|Q]
+
+Example:
+    python trends.py Pylons pyramid --freq Q
+"""
+
+import os
+import sys
+import csv
+import argparse
+
+from rankstats import TwoSampleRanks
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+trends_output_dir = os.path.join(script_dir, '..', 'outputs', 'trends')
+dataset_dir = os.path.join(script_dir, '..', 'datasets')
+
+METRICS = {
+    "delivery delay": "t2",
+    "merge time": "t1",
+    "PR lifetime": "lifetime"
+}
+FREQ_MONTHS = {"M": 1, "Q": 3}
+
+
+def slide_metric(items, boundaries, width, step):
+    """
+    Slide a (previous, current) window pair over one metric.
+
+    Args:
+        items: list of (timestamp, value), sorted by timestamp
+        boundaries: ascending month-start timestamps
+        width: window length in months
+        step: months between consecutive windows
+
+    Returns a list of (n, median, delta, p_value) per window, where delta and p_value
+    compare the window against the `width` months right before it.
+    """
+    state = TwoSampleRanks([value for _, value in items])
+    p0 = p1 = p2 = 0  # previous = items[p0:p1], current = items[p1:p2]
+    results = []
+    for k in range(width, len(boundaries) - width, step):
+        prev_start, cur_start, cur_end = boundaries[k - width], boundaries[k], boundaries[k + width]
+        while p2 < len(items) and items[p2][0] < cur_end:
+            state.add_second(items[p2][1])
+            p2 += 1
+        while p1 < p2 and items[p1][0] < cur_start:
+            state.remove_second(items[p1][1])
+            state.add_first(items[p1][1])
+            p1 += 1
+        while p0 < p1 and items[p0][0] < prev_start:
+            state.remove_first(items[p0][1])
+            p0 += 1
+        results.append((state.n_second, state.median_second(), state.cliffs_delta(), state.p_value()))
+    return results
+
+
+def rolling_trends(data, date_column="creation_date", freq="Q", step=None):
+    """
+    Compute the per-window rows for one repo's DataFrame (needs `date_column`, t1, t2, lifetime).
+    """
+    import pandas as pd
+    from metrics import cliff_magnitude
+
+    width = FREQ_MONTHS[freq]
+    step = step or width
+    dates = pd.to_datetime(data[date_column], utc=True)
+    if dates.dropna().empty:
+        return []
+
+    # Month starts covering the data, padded by one window on each side. Starting from the
+    # calendar period (month or quarter) of the first PR keeps windows aligned across repos.
+    first = dates.min().tz_localize(None).to_period(freq).to_timestamp() - pd.DateOffset(months=width)
+    last = dates.max().tz_localize(None).to_period("M").to_timestamp() + pd.DateOffset(months=2 * width)
+    month_starts = pd.date_range(first, last, freq="MS", tz="UTC")
+    epoch = pd.Timestamp(0, tz="UTC")
+    boundaries = [(m - epoch).total_seconds() for m in month_starts]
+    created = (dates - epoch).dt.total_seconds()
+
+    per_metric = {}
+    for metric_name, col in METRICS.items():
+        items = sorted((ts, v) for ts, v in zip(created, data[col]) if pd.notna(ts) and pd.notna(v))
+        per_metric[metric_name] = slide_metric(items, boundaries, width, step)
+
+    rows = []
+    for i, k in enumerate(range(width, len(boundaries) - width, step)):
+        row = {
+            "window_start": month_starts[k].date().isoformat(),
+            "window_end": month_starts[k + width].date().isoformat(),
+        }
+        for metric_name in METRICS:
+            n, median, delta, p_value = per_metric[metric_name][i]
+            row[f"n: {metric_name}"] = n
+            row[f"median: {metric_name}"] = "" if median is None else median
+            row[f"Cliff delta (magnitude): {metric_name}"] = cliff_magnitude(delta)
+            row[f"Cliff delta (estimate): {metric_name}"] = "" if delta is None else format(delta, ".10f")
+            row[f"MWW test (p-value): {metric_name}"] = "" if p_value is None else format(p_value, ".10f")
+        rows.append(row)
+
+    # Trim empty windows at both ends
+    def empty(row):
+        return all(row[f"n: {m}"] == 0 for m in METRICS)
+    while rows and empty(rows[0]):
+        rows.pop(0)
+    while rows and empty(rows[-1]):
+        rows.pop()
+    return rows
+
+
+def save_rows(rows, output_file):
+    if not rows:
+        print("No windows with data, nothing saved")
+        return
+    os.makedirs(trends_output_dir, exist_ok=True)
+    with open(output_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved trends to {output_file}")
+
+
+def run_trends(owner, repo_name, freq="Q", step=None):
+    from metrics import load_mined_data
+
+    data = load_mined_data(repo_name)
+    if data is None:
+        return
+    rows = rolling_trends(data, "creation_date", freq, step)
+    save_rows(rows, os.path.join(trends_output_dir, f'{repo_name}_trends_{freq}.csv'))
+
+
+def run_trends_original(pull_csv_path, date_column, freq="Q", step=None):
+    """Trends for every project in the authors' PR dataset (t1/t2 built as in dataSetup_from_original_datasets)"""
+    import pandas as pd
+
+    pr_data = pd.read_csv(pull_csv_path)
+    if date_column not in pr_data.columns:
+        print(f"Column '{date_column}' not in {pull_csv_path}, available: {list(pr_data.columns)}")
+        sys.exit(1)
+    pr_data["t1"] = pd.to_numeric(pr_data["merge_time"], errors="coerce")
+    pr_data["t2"] = pd.to_numeric(pr_data["delivery_time"], errors="coerce")
+    pr_data["lifetime"] = pr_data["t1"] + pr_data["t2"]
+
+    all_rows = []
+    for project_name, group in pr_data.groupby("project"):
+        for row in rolling_trends(group, date_column, freq, step):
+            all_rows.append({"project": project_name, **row})
+    save_rows(all_rows, os.path.join(trends_output_dir, f'original_trends_{freq}.csv'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-window trends of merge and delivery time")
+    parser.add_argument("owner", nargs="?")
+    parser.add_argument("repo", nargs="?")
+    parser.add_argument("--freq", choices=sorted(FREQ_MONTHS), default="Q", help="window length: month or quarter")
+    parser.add_argument("--step", type=int, default=None, help="months between windows (default: window length)")
+    parser.add_argument("--original", metavar="DATE_COLUMN",
+                        help="run on datasets/pull_requests_meta_data.csv, windowing by this date column")
+    args = parser.parse_args()
+
+    if args.original:
+        run_trends_original(os.path.join(dataset_dir, 'pull_requests_meta_data.csv'), args.original, args.freq, args.step)
+    elif args.owner and args.repo:
+        run_trends(args.owner, args.repo, args.freq, args.step)
+    else:
+        parser.print_usage()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Lease-based work queue for sharded runs (see shards.py)
+
+Workers on any machine claim a task for a limited lease, extend it with heartbeats while
+they work, and either complete it or fail it. Failed tasks and tasks whose lease expired
+(crashed worker) go back to the queue until `max_attempts` is reached.
+
+The local backend is a single SQLite file, which is enough for several processes on one
+machine or nodes sharing a filesystem. Another backend (e.g. Redis) only has to provide
+the methods of `WorkQueue`; `open_queue` picks the backend from the URL.
+"""
+
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing
+
+
+class Task:
+    def __init__(self, task_id, kind, payload, attempts):
+        self.id = task_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"Task({self.id}, {self.kind}, {self.payload})"
+
+
+class WorkQueue:
+    """Interface shared by queue backends"""
+
+    def put(self, kind, payload, key=None):
+        """Add a task; tasks with an existing `key` are not added twice. Returns True if added."""
+        raise NotImplementedError
+
+    def claim(self, worker_id, lease_seconds):
+        """Lease the next available task to `worker_id`, or return None"""
+        raise NotImplementedError
+
+    def heartbeat(self, task_id, worker_id, lease_seconds):
+        """Extend a lease. Returns False if the worker no longer holds it."""
+        raise NotImplementedError
+
+    def complete(self, task_id, worker_id, result=None):
+        raise NotImplementedError
+
+    def fail(self, task_id, worker_id, error):
+        """Release a task after an error; it is retried until it runs out of attempts"""
+        raise NotImplementedError
+
+    def counts(self):
+        """{status: number of tasks} with status in queued/leased/done/failed"""
+        raise NotImplementedError
+
+    def results(self, kind=None):
+        """[(payload, result)] of completed tasks"""
+        raise NotImplementedError
+
+    def failures(self):
+        """[(kind, payload, last_error)] of tasks that ran out of attempts"""
+        raise NotImplementedError
+
+    def is_drained(self):
+        counts = self.counts()
+        return counts.get("queued", 0) == 0 and counts.get("leased", 0) == 0
+
+
+class SQLiteWorkQueue(WorkQueue):
+
+    def __init__(self, path, max_attempts=3, retry_delay=30):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT UNIQUE,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    owner TEXT,
+                    lease_expires REAL,
+                    available_at REAL NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    result TEXT
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=60000")
+        return conn
+
+    def put(self, kind, payload, key=None):
+        with closing(self._connect()) as conn:
+            cur = conn.execute("INSERT OR IGNORE INTO tasks (key, kind, payload) VALUES (?, ?, ?)",
+                               (key, kind, json.dumps(payload)))
+            return cur.rowcount == 1
+
+    def claim(self, worker_id, lease_seconds):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Leases of crashed workers that have no attempts left are given up on
+            conn.execute("""
+                UPDATE tasks SET status = 'failed', owner = NULL,
+                                 last_error = COALESCE(last_error, 'lease expired')
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (now, self.max_attempts))
+            row = conn.execute("""
+                SELECT id, kind, payload, attempts FROM tasks
+                WHERE (status = 'queued' AND available_at <= ?)
+                   OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY id LIMIT 1
+            """, (now, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            task_id, kind, payload, attempts = row
+            conn.execute("""
+                UPDATE tasks SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE id = ?
+            """, (worker_id, now + lease_seconds, task_id))
+            conn.execute("COMMIT")
+            return Task(task_id, kind, json.loads(payload), attempts + 1)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, task_id, worker_id, lease_seconds):
+        with closing(self._connect()) as conn:
+            cur = conn.execute("""
+                UPDATE tasks SET lease_expires = ?
+                WHERE id = ? AND owner = ? AND status = 'leased'
+            """, (time.time() + lease_seconds, task_id, worker_id))
+            return cur.rowcount == 1
+
+    def complete(self, task_id, worker_id, result=None):
+        with closing(self._connect()) as conn:
+            cur = conn.execute("""
+                UPDATE tasks SET status = 'done', result = ?, lease_expires = NULL
+                WHERE id = ? AND owner = ? AND status = 'leased'
+            """, (json.dumps(result), task_id, worker_id))
+            return cur.rowcount == 1
+
+    def fail(self, task_id, worker_id, error):
+        with closing(self._connect()) as conn:
+            cur = conn.execute("""
+                UPDATE tasks SET
+                    status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    owner = NULL, lease_expires = NULL, last_error = ?,
+                    available_at = ? + ? * attempts
+                WHERE id = ? AND owner = ? AND status = 'leased'
+            """, (self.max_attempts, str(error), time.time(), self.retry_delay, task_id, worker_id))
+            return cur.rowcount == 1
+
+    def counts(self):
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def results(self, kind=None):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("""
+                SELECT payload, result FROM tasks
+                WHERE status = 'done' AND (? IS NULL OR kind = ?) ORDER BY id
+            """, (kind, kind)).fetchall()
+        return [(json.loads(p), json.loads(r) if r else None) for p, r in rows]
+
+    def failures(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT kind, payload, last_error FROM tasks WHERE status = 'failed' ORDER BY id").fetchall()
+        return [(kind, json.loads(p), error) for kind, p, error in rows]
+
+
+def open_queue(url, **kwargs):
+    """
+    Open a queue from a URL or path: `sqlite:///path/to/queue.db` or a plain file path.
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteWorkQueue(url[len("sqlite:///"):], **kwargs)
+    if "://" in url:
+        raise ValueError(f"No queue backend for '{url}' (only SQLite is included; "
+                         "another backend needs to implement WorkQueue)")
+    return SQLiteWorkQueue(url, **kwargs)